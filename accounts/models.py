@@ -1,5 +1,11 @@
+import time
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 class User(AbstractUser):
     # We inherit username, first_name, last_name, email, password, is_staff, is_active, is_superuser, etc.
@@ -13,3 +19,36 @@ class User(AbstractUser):
         return self.username # Or self.email if you prefer
 
 
+
+
+def token_revocation_key(user_id):
+    return f"auth:tokens_revoked_at_ms:{user_id}"
+
+
+def now_ms():
+    """The current time in epoch milliseconds, as used by revocations and the auth_time_ms claim."""
+    return int(time.time() * 1000)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Marks every token issued to the user so far as revoked. WebSocket auth is
+    stateless (claims only), so it checks this cache entry instead of the user
+    row. The time is kept in milliseconds: `iat` only has whole seconds, which
+    would also reject a login made in the same second as the revocation.
+    Access tokens expire on their own, so the entry only needs to outlive them.
+    """
+    timeout = int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()) + 60
+    cache.set(token_revocation_key(user_id), now_ms(), timeout=timeout)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_deactivation(sender, instance, created, **kwargs):
+    # _password is only set while a new password is being saved
+    if not created and (not instance.is_active or getattr(instance, '_password', None) is not None):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
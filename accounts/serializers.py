@@ -3,6 +3,9 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.validators import validate_email # For email validation
 from django.core.exceptions import ValidationError # For email validation
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .models import now_ms
 
 User = get_user_model() # Gets our custom accounts.User model
 
@@ -82,4 +85,24 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
             first_name=validated_data.get('first_name', ''), # Use .get for optional fields
             last_name=validated_data.get('last_name', '')
         )
-        return user
\ No newline at end of file
+        return user
+
+
+class SellerTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the username and seller profile pk as signed claims, so the WebSocket
+    middleware can identify the seller from the token alone, without a query.
+    `auth_time_ms` records the login in milliseconds, for comparing against
+    revocations. Configured via SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'];
+    refreshed access tokens inherit the claims from the refresh token.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['auth_time_ms'] = now_ms()
+        seller_profile = getattr(user, 'seller_profile', None)
+        if seller_profile is not None:
+            token['seller_id'] = seller_profile.pk
+        return token
@@ -5,14 +5,19 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
 
+from core_backend.versions import ConditionalGetMixin
 from orders.models import Order, OrderItem
 
 
-class AnalyticsOverview(APIView):
-    """Return sales analytics for the authenticated seller."""
+class AnalyticsOverview(ConditionalGetMixin, APIView):
+    """Return sales analytics for the authenticated seller; 304 while their orders are unchanged."""
     permission_classes = [permissions.IsAuthenticated]
+    version_resources = ('orders',)
 
     def get(self, request):
+        return self.conditional_response(request, self.get_overview)
+
+    def get_overview(self, request):
         seller = request.user.seller_profile
         orders = (
             Order.objects.filter(seller=seller)
@@ -46,15 +51,15 @@ class AnalyticsOverview(APIView):
         status_counts = orders.values('status').annotate(count=Count('id'))
         status_distribution = {sc['status']: sc['count'] for sc in status_counts}
 
-        # Top 5 products by quantity sold
+        # Top 5 products by quantity sold, grouped on the item's own snapshot
         top_products_qs = (
             OrderItem.objects.filter(order__in=revenue_orders)
-            .values('product__name')
+            .values('product_name')
             .annotate(quantity=Sum('quantity'))
             .order_by('-quantity')[:5]
         )
         top_products = [
-            {'name': p['product__name'] or 'Unknown', 'quantity': p['quantity']}
+            {'name': p['product_name'] or 'Unknown', 'quantity': p['quantity']}
             for p in top_products_qs
         ]
 
@@ -114,7 +114,7 @@ function OrderDetailModal({ show, onClose, order, onOrderUpdate }) {
               {order.items.map(item => (
                 <Paper variant="outlined" key={item.id} sx={{ p: 1, display: 'flex', justifyContent: 'space-between' }}>
                   <Typography>
-                    {item.quantity} x {item.product?.name} 
+                    {item.quantity} x {item.product_name || 'Deleted Product'} 
                     {item.selected_size && ` (Size: ${item.selected_size})`}
                   </Typography>
                   <Typography fontWeight="bold">
@@ -1,7 +1,19 @@
-import { useEffect } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 import useWebSocket from "react-use-websocket";
 import { useAuthStore } from "../store/authStore";
 
+const LAST_SEQ_KEY = "inboxLastSeq";
+// How many recent seqs are remembered for dropping duplicates (the server
+// keeps this many events per seller for replay)
+const SEEN_SEQ_LIMIT = 1000;
+
+// Event seqs are Redis stream ids ("<millis>-<counter>")
+const compareSeq = (a, b) => {
+  const [aMillis, aCounter] = a.split("-").map(Number);
+  const [bMillis, bCounter] = b.split("-").map(Number);
+  return aMillis - bMillis || aCounter - bCounter;
+};
+
 export const useInboxSocket = () => {
   // Get the access token from our auth store
   const accessToken = useAuthStore((state) => state.accessToken);
@@ -16,41 +28,130 @@ export const useInboxSocket = () => {
   ).split("/api")[0];
   const socketUrl = `${wsProtocol}://${wsHost}/ws/inbox/`;
 
+  // The last event seq we handled. It is sent on every (re)connect so the
+  // server replays only what we missed instead of us reloading everything.
+  const lastSeqRef = useRef(sessionStorage.getItem(LAST_SEQ_KEY));
+  // Seqs already handled, oldest first. Publishers can broadcast events out of
+  // seq order, so an event older than lastSeq isn't necessarily a duplicate.
+  const seenSeqsRef = useRef(new Set());
+  // Frames received on the current connection, acknowledged back to the
+  // server so it can tell when we fall behind and stop sending
+  const receivedFramesRef = useRef(0);
+  const sendAckRef = useRef(null);
+  // Events delivered by the latest frame (several when the server batched them)
+  const [lastEvents, setLastEvents] = useState([]);
+  // Bumped when the server can't replay the gap; pages refetch over REST then
+  const [resyncVersion, setResyncVersion] = useState(0);
+
+  const rememberSeq = (seq) => {
+    lastSeqRef.current = seq;
+    if (seq) {
+      sessionStorage.setItem(LAST_SEQ_KEY, seq);
+    } else {
+      sessionStorage.removeItem(LAST_SEQ_KEY);
+    }
+  };
+
+  // Records an event seq; returns false if it was already handled
+  const markSeen = (seq) => {
+    const seen = seenSeqsRef.current;
+    if (seen.has(seq)) {
+      return false;
+    }
+    seen.add(seq);
+    if (seen.size > SEEN_SEQ_LIMIT) {
+      // Sets iterate in insertion order, so this drops the oldest
+      seen.delete(seen.values().next().value);
+    }
+    if (!lastSeqRef.current || compareSeq(seq, lastSeqRef.current) > 0) {
+      rememberSeq(seq);
+    }
+    return true;
+  };
+
+  // Called on every connect attempt, so reconnects pick up the latest seq
+  const getSocketUrl = useCallback(() => {
+    // We send the JWT token as a query parameter for authentication
+    const params = new URLSearchParams({ token: accessToken, acks: "1" });
+    if (lastSeqRef.current) {
+      params.set("last_seq", lastSeqRef.current);
+    }
+    return `${socketUrl}?${params}`;
+  }, [socketUrl, accessToken]);
+
   // The useWebSocket hook from the library
   const { lastJsonMessage, sendJsonMessage } = useWebSocket(
     // Only try to connect if an accessToken exists
-    accessToken ? socketUrl : null,
+    accessToken ? getSocketUrl : null,
     {
-      // We will send the JWT token as a query parameter for authentication
-      // This is a common pattern for authenticating WebSocket connections
-      queryParams: { token: accessToken },
-      // Always reconnect on close
+      // Always reconnect on close. A 4008 close means we fell behind; the
+      // reconnect sends our last seq and the server replays what we missed.
       shouldReconnect: () => true,
+      onOpen: () => {
+        receivedFramesRef.current = 0;
+      },
+      // Runs for every frame, including ones React batches into one render
+      onMessage: () => {
+        receivedFramesRef.current += 1;
+        sendAckRef.current?.({ type: "ack", frames: receivedFramesRef.current });
+      },
+      onClose: (event) => {
+        if (event.code === 4008) {
+          console.warn("Inbox socket closed for lagging; reconnecting to catch up.");
+        }
+      },
     }
   );
 
+  sendAckRef.current = sendJsonMessage;
+
   // This `useEffect` hook listens for incoming messages from the WebSocket
   useEffect(() => {
         if (lastJsonMessage !== null) {
             console.log("Received WebSocket message:", lastJsonMessage);
 
             // Destructure the event from the server
-            const { type, payload } = lastJsonMessage;
-
-            // (+) Handle the new_order event specifically
-            if (type === 'new_order') {
-                const order = payload; // The payload IS the order data
-                // For now, a detailed alert proves the end-to-end connection works!
-                alert(
-                    `🎉 New Order Received! 🎉\n\n` +
-                    `Order ID: ${order.id}\n` +
-                    `Customer: ${order.customer_name}\n` +
-                    `Total: KES ${order.total_amount}`
-                );
-
-                // TODO in next step: Instead of an alert, we'll use a toast notification
-                // library and automatically update the orders list on the OrderPage.
+            const { type, seq } = lastJsonMessage;
+
+            if (type === 'connection_established') {
+                // A fresh client starts from the current end of the stream
+                if (!lastSeqRef.current && seq) {
+                    rememberSeq(seq);
+                }
+                return;
             }
+            if (type === 'resync_required') {
+                seenSeqsRef.current.clear();
+                rememberSeq(seq);
+                setResyncVersion((version) => version + 1);
+                return;
+            }
+            // The server coalesces bursts of events into one batch frame
+            const frames = type === 'batch' ? lastJsonMessage.events : [lastJsonMessage];
+            // Replayed and live delivery can overlap right after a reconnect;
+            // events without a seq (Redis unavailable) can't be deduplicated
+            const fresh = frames.filter((event) => !event.seq || markSeen(event.seq));
+            if (fresh.length === 0) {
+                return;
+            }
+            setLastEvents(fresh);
+
+            fresh.forEach((event) => {
+                // (+) Handle the new_order event specifically
+                if (event.type === 'new_order') {
+                    const order = event.payload; // The payload IS the order data
+                    // For now, a detailed alert proves the end-to-end connection works!
+                    alert(
+                        `🎉 New Order Received! 🎉\n\n` +
+                        `Order ID: ${order.id}\n` +
+                        `Customer: ${order.customer_name}\n` +
+                        `Total: KES ${order.total_amount}`
+                    );
+
+                    // TODO in next step: Instead of an alert, we'll use a toast notification
+                    // library and automatically update the orders list on the OrderPage.
+                }
+            });
         }
     }, [lastJsonMessage]); // Rerun this effect whenever a new message arrives
 
@@ -61,5 +162,10 @@ export const useInboxSocket = () => {
     sendJsonMessage({ message });
   };
 
-  return { sendMessage, lastJsonMessage };
+  return {
+    sendMessage,
+    lastEvents,
+    lastJsonMessage: lastEvents.length ? lastEvents[lastEvents.length - 1] : null,
+    resyncVersion,
+  };
 };
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { Box, Typography, List, ListItemButton, ListItemText, Divider, TextField, IconButton, Switch, FormControlLabel } from '@mui/material';
+import { Box, Typography, List, ListItemButton, ListItemText, Divider, TextField, IconButton, Switch, FormControlLabel, Badge, Button } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
 import apiClient from '../services/api';
 import { useInboxSocket } from '../hooks/useInboxSocket';
@@ -10,17 +10,29 @@ function InboxPage() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
   const [takeover, setTakeover] = useState(false);
+  // Cursor URLs for the next (older) page, null when there is nothing more
+  const [conversationsNext, setConversationsNext] = useState(null);
+  const [messagesNext, setMessagesNext] = useState(null);
 
-  const { lastJsonMessage, sendJsonMessage } = useInboxSocket();
+  const { lastEvents, resyncVersion } = useInboxSocket();
 
-  const fetchConversations = async () => {
-    const resp = await apiClient.get('/whatsapp/conversations/');
-    setConversations(resp.data);
+  const fetchConversations = async (url = '/whatsapp/conversations/') => {
+    const resp = await apiClient.get(url);
+    setConversations((prev) => (url === '/whatsapp/conversations/' ? resp.data.results : [...prev, ...resp.data.results]));
+    setConversationsNext(resp.data.next);
   };
 
+  // Pages arrive newest first; the chat shows them oldest first
   const fetchMessages = async (conversationId) => {
     const resp = await apiClient.get(`/whatsapp/conversations/${conversationId}/messages/`);
-    setMessages(resp.data);
+    setMessages([...resp.data.results].reverse());
+    setMessagesNext(resp.data.next);
+  };
+
+  const loadOlderMessages = async () => {
+    const resp = await apiClient.get(messagesNext);
+    setMessages((prev) => [...[...resp.data.results].reverse(), ...prev]);
+    setMessagesNext(resp.data.next);
   };
 
   useEffect(() => {
@@ -30,17 +42,50 @@ function InboxPage() {
   useEffect(() => {
     if (selected) {
       fetchMessages(selected.id);
+      if (selected.unread_count) {
+        apiClient.post(`/whatsapp/conversations/${selected.id}/mark_read/`);
+        setConversations((prev) => prev.map((c) => (c.id === selected.id ? { ...c, unread_count: 0 } : c)));
+      }
     }
   }, [selected]);
 
+  // The socket missed too much while disconnected; reload from the API
   useEffect(() => {
-    if (lastJsonMessage && lastJsonMessage.type === 'message') {
-      const msg = lastJsonMessage.message;
-      if (selected && msg.conversation === selected.id) {
-        setMessages((prev) => [...prev, msg]);
+    if (resyncVersion > 0) {
+      fetchConversations();
+      if (selected) {
+        fetchMessages(selected.id);
       }
     }
-  }, [lastJsonMessage]);
+  }, [resyncVersion]);
+
+  useEffect(() => {
+    lastEvents.forEach((event) => {
+      if (event.type === 'message') {
+        const msg = event.message;
+        if (selected && msg.conversation === selected.id) {
+          // Our own sends are already shown from the POST response
+          setMessages((prev) => (prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]));
+        }
+      } else if (event.type === 'conversation_updated') {
+        const row = event.payload;
+        const isOpen = selected && row.id === selected.id;
+        if (isOpen && row.unread_count) {
+          // The seller is looking at it, so it's read
+          apiClient.post(`/whatsapp/conversations/${row.id}/mark_read/`);
+        }
+        // Move the row to the top instead of reloading the list
+        setConversations((prev) => {
+          const current = prev.find((c) => c.id === row.id);
+          if (current && current.updated_at > row.updated_at) {
+            return prev;
+          }
+          const updated = isOpen ? { ...row, unread_count: 0 } : row;
+          return [updated, ...prev.filter((c) => c.id !== row.id)];
+        });
+      }
+    });
+  }, [lastEvents]);
 
   const handleSend = async () => {
     if (!input || !selected) return;
@@ -57,9 +102,13 @@ function InboxPage() {
           {conversations.map((c) => (
             <ListItemButton key={c.id} selected={selected?.id === c.id} onClick={() => setSelected(c)}>
               <ListItemText primary={c.customer.name || c.customer.phone_number} secondary={c.last_message?.content} />
+              <Badge color="primary" badgeContent={c.unread_count} sx={{ mr: 1 }} />
             </ListItemButton>
           ))}
         </List>
+        {conversationsNext && (
+          <Button fullWidth onClick={() => fetchConversations(conversationsNext)}>Load more</Button>
+        )}
       </Box>
       <Box sx={{ flexGrow: 1, display: 'flex', flexDirection: 'column' }}>
         {selected ? (
@@ -69,6 +118,11 @@ function InboxPage() {
               <FormControlLabel control={<Switch checked={takeover} onChange={(e) => setTakeover(e.target.checked)} />} label="Take over" />
             </Box>
             <Box sx={{ flexGrow: 1, p: 2, overflowY: 'auto' }}>
+              {messagesNext && (
+                <Box sx={{ textAlign: 'center', mb: 1 }}>
+                  <Button size="small" onClick={loadOlderMessages}>Load older messages</Button>
+                </Box>
+              )}
               {messages.map((m) => (
                 <Box key={m.id} sx={{ display: 'flex', justifyContent: m.sender === 'seller' ? 'flex-end' : 'flex-start', mb: 1 }}>
                   <Box sx={{ bgcolor: m.sender === 'seller' ? '#dcf8c6' : '#f1f0f0', p: 1.5, borderRadius: 2, maxWidth: '70%' }}>
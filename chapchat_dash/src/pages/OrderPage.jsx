@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { Box, Typography, Alert, Chip, IconButton } from "@mui/material";
+import { Box, Typography, Alert, Chip, IconButton, Button, TextField, MenuItem } from "@mui/material";
 import { DataGrid } from "@mui/x-data-grid";
 import VisibilityIcon from "@mui/icons-material/Visibility";
 import apiClient from "../services/api";
@@ -16,22 +16,37 @@ const statusColors = {
   CANCELLED: "error",
   FAILED: "error",
   PENDING_PAYMENT: "default",
+  PAYMENT_SENDING: "default",
 };
 
+// Statuses sellers can move several orders to at once
+const BULK_STATUSES = ["PROCESSING", "READY_FOR_PICKUP", "OUT_FOR_DELIVERY", "DELIVERED", "PICKED_UP", "CANCELLED"];
+
+// The table only needs the summary columns; full orders are fetched on demand
+const ORDERS_URL = "/orders/?view=summary";
+
 function OrderPage() {
   const [orders, setOrders] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Cursor URL for the next (older) page, null when there is nothing more
+  const [nextPage, setNextPage] = useState(null);
+
+  const [selection, setSelection] = useState({ type: "include", ids: new Set() });
+  const [bulkStatus, setBulkStatus] = useState("OUT_FOR_DELIVERY");
+  const [bulkResult, setBulkResult] = useState(null);
 
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [selectedOrder, setSelectedOrder] = useState(null);
 
-  const fetchOrders = async () => {
+  const fetchOrders = async (url = ORDERS_URL) => {
     setIsLoading(true);
     setError(null);
     try {
-      const response = await apiClient.get("/orders/");
-      setOrders(response.data);
+      const response = await apiClient.get(url);
+      // Orders come newest first, one cursor page at a time
+      setOrders((prev) => (url === ORDERS_URL ? response.data.results : [...prev, ...response.data.results]));
+      setNextPage(response.data.next);
     } catch (err) {
       setError("Failed to fetch orders.");
       console.error(err);
@@ -44,9 +59,16 @@ function OrderPage() {
     fetchOrders();
   }, []);
 
-  const handleViewOrder = (order) => {
-    setSelectedOrder(order);
-    setIsModalOpen(true);
+  const handleViewOrder = async (order) => {
+    try {
+      // Summary rows carry no line items or delivery details
+      const response = await apiClient.get(`/orders/${order.id}/`);
+      setSelectedOrder(response.data);
+      setIsModalOpen(true);
+    } catch (err) {
+      setError("Failed to load the order.");
+      console.error(err);
+    }
   };
 
   const handleCloseModal = () => {
@@ -54,6 +76,25 @@ function OrderPage() {
     setSelectedOrder(null);
   };
 
+  const selectedIds =
+    selection.type === "include"
+      ? Array.from(selection.ids)
+      : orders.map((order) => order.id).filter((id) => !selection.ids.has(id));
+
+  // One request (and one transaction) for the whole selection
+  const handleBulkUpdate = async () => {
+    setError(null);
+    try {
+      const response = await apiClient.post("/orders/bulk_status/", { order_ids: selectedIds, status: bulkStatus });
+      setBulkResult(response.data);
+      setSelection({ type: "include", ids: new Set() });
+      fetchOrders();
+    } catch (err) {
+      setError("Failed to update the selected orders.");
+      console.error(err);
+    }
+  };
+
   const handleOrderUpdate = () => {
     // This is called by the modal on a successful update
     handleCloseModal(); // Close the modal
@@ -119,11 +160,46 @@ function OrderPage() {
         </Alert>
       )}
 
+      {bulkResult && (
+        <Alert
+          severity={Object.keys(bulkResult.errors).length ? "warning" : "success"}
+          sx={{ mb: 2 }}
+          onClose={() => setBulkResult(null)}
+        >
+          {bulkResult.updated.length} order(s) updated.
+          {Object.entries(bulkResult.errors).map(([id, reason]) => ` #${id}: ${reason}`).join("")}
+        </Alert>
+      )}
+
+      <Box sx={{ display: "flex", gap: 2, mb: 2, alignItems: "center" }}>
+        <TextField
+          select
+          size="small"
+          label="Move selected to"
+          value={bulkStatus}
+          onChange={(e) => setBulkStatus(e.target.value)}
+          sx={{ minWidth: 220 }}
+        >
+          {BULK_STATUSES.map((status) => (
+            <MenuItem key={status} value={status}>
+              {status.replaceAll("_", " ")}
+            </MenuItem>
+          ))}
+        </TextField>
+        <Button variant="contained" onClick={handleBulkUpdate} disabled={selectedIds.length === 0}>
+          Apply to {selectedIds.length} selected
+        </Button>
+      </Box>
+
       <Box sx={{ height: 650, width: "100%" }}>
         <DataGrid
           rows={orders}
           columns={columns}
           loading={isLoading}
+          checkboxSelection
+          disableRowSelectionOnClick
+          rowSelectionModel={selection}
+          onRowSelectionModelChange={setSelection}
           pageSizeOptions={[10, 25, 100]}
           initialState={{
             pagination: { paginationModel: { pageSize: 10 } },
@@ -132,6 +208,13 @@ function OrderPage() {
           sx={{ border: "1px solid rgba(224, 224, 224, 1)" }}
         />
       </Box>
+      {nextPage && (
+        <Box sx={{ textAlign: "center", mt: 2 }}>
+          <Button onClick={() => fetchOrders(nextPage)} disabled={isLoading}>
+            Load older orders
+          </Button>
+        </Box>
+      )}
       {selectedOrder && (
         <OrderDetailModal
           show={isModalOpen}
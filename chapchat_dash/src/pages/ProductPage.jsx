@@ -4,6 +4,7 @@ import { DataGrid } from '@mui/x-data-grid';
 import AddIcon from '@mui/icons-material/Add';
 import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
+import UploadFileIcon from '@mui/icons-material/UploadFile';
 
 import apiClient from '../services/api';
 import ProductFormModal from '../components/ProductFormModal'; // Reuse our existing modal
@@ -17,6 +18,10 @@ function ProductPage() {
     const [isModalOpen, setIsModalOpen] = useState(false);
     const [selectedProduct, setSelectedProduct] = useState(null);
 
+    // Result of the last bulk CSV import
+    const [importResult, setImportResult] = useState(null);
+    const [isImporting, setIsImporting] = useState(false);
+
     const fetchProducts = async () => {
         setIsLoading(true);
         setError(null);
@@ -70,6 +75,32 @@ function ProductPage() {
         }
     };
 
+    const handleImportFile = async (event) => {
+        const file = event.target.files[0];
+        event.target.value = ''; // Let the same file be picked again
+        if (!file) return;
+        setIsImporting(true);
+        setImportResult(null);
+        setError(null);
+        try {
+            const response = await apiClient.post('/products/import/', await file.text(), {
+                headers: { 'Content-Type': 'text/csv' },
+            });
+            setImportResult(response.data);
+            fetchProducts();
+        } catch (err) {
+            // A 400 with a report means no row could be imported
+            if (err.response?.data?.errors) {
+                setImportResult(err.response.data);
+            } else {
+                setError('Failed to import products.');
+            }
+            console.error(err);
+        } finally {
+            setIsImporting(false);
+        }
+    };
+
     // Define the columns for our DataGrid
     const columns = [
         { field: 'name', headerName: 'Product Name', flex: 2 },
@@ -106,16 +137,52 @@ function ProductPage() {
                 <Typography variant="h4" component="h1">
                     Product Management
                 </Typography>
-                <Button
-                    variant="contained"
-                    startIcon={<AddIcon />}
-                    onClick={handleOpenAddModal}
-                >
-                    Add New Product
-                </Button>
+                <Box sx={{ display: 'flex', gap: 1 }}>
+                    <Button
+                        variant="outlined"
+                        component="label"
+                        startIcon={isImporting ? <CircularProgress size={18} /> : <UploadFileIcon />}
+                        disabled={isImporting}
+                    >
+                        Import CSV
+                        <input type="file" accept=".csv,text/csv" hidden onChange={handleImportFile} />
+                    </Button>
+                    <Button
+                        variant="contained"
+                        startIcon={<AddIcon />}
+                        onClick={handleOpenAddModal}
+                    >
+                        Add New Product
+                    </Button>
+                </Box>
             </Box>
             
             {error && <Alert severity="error" sx={{ mb: 2 }}>{error}</Alert>}
+
+            {importResult && (
+                <Alert
+                    severity={importResult.errors.length ? 'warning' : 'success'}
+                    onClose={() => setImportResult(null)}
+                    sx={{ mb: 2 }}
+                >
+                    Imported {importResult.created} new and {importResult.updated} updated products.
+                    {importResult.errors.length > 0 && (
+                        <ul style={{ margin: '8px 0 0', paddingLeft: 20 }}>
+                            {importResult.errors.slice(0, 20).map((rowError) => (
+                                <li key={rowError.row}>
+                                    Row {rowError.row}{rowError.sku ? ` (${rowError.sku})` : ''}:{' '}
+                                    {Object.entries(rowError.errors)
+                                        .map(([field, messages]) => `${field}: ${[].concat(messages).join(' ')}`)
+                                        .join('; ')}
+                                </li>
+                            ))}
+                            {importResult.errors.length > 20 && (
+                                <li>…and {importResult.errors.length - 20} more rows with errors.</li>
+                            )}
+                        </ul>
+                    )}
+                </Alert>
+            )}
             
             <Box sx={{ height: 600, width: '100%' }}>
                 <DataGrid
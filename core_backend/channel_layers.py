@@ -0,0 +1,24 @@
+"""
+CHANNEL_LAYERS construction, shared by settings and the fan-out benchmark.
+
+Both channels_redis layers shard across every host listed: the core layer
+hashes channel and group names onto hosts, the pub/sub layer does the same
+for its subscriptions.
+"""
+
+CHANNEL_LAYER_BACKENDS = {
+    # Lists with per-channel capacity and expiry; messages survive brief consumer stalls
+    'core': 'channels_redis.core.RedisChannelLayer',
+    # Redis pub/sub; lower latency, no buffering, messages to an absent consumer are lost
+    'pubsub': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+}
+
+
+def channel_layer_config(backend, hosts, capacity=1000, expiry=60):
+    """Returns one CHANNEL_LAYERS entry for the given backend name and Redis URLs."""
+    if backend not in CHANNEL_LAYER_BACKENDS:
+        raise ValueError(f"Unknown channel layer backend {backend!r}; expected one of {sorted(CHANNEL_LAYER_BACKENDS)}")
+    config = {"hosts": list(hosts)}
+    if backend == 'core':
+        config.update({"capacity": capacity, "expiry": expiry})
+    return {"BACKEND": CHANNEL_LAYER_BACKENDS[backend], "CONFIG": config}
@@ -1,28 +1,63 @@
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework_simplejwt.models import TokenUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
 from urllib.parse import parse_qs
 
+from accounts.models import token_revocation_key
+
 User = get_user_model()
 
 @database_sync_to_async
-def get_user_from_token(token_string):
+def get_user_from_db(user_id):
     """
-    Asynchronously gets a user from a JWT access token.
+    Fallback for tokens issued before the seller_id claim existed.
     """
     try:
-        # Validate the token
+        return User.objects.get(id=user_id, is_active=True)
+    except User.DoesNotExist:
+        return AnonymousUser()
+
+async def is_token_revoked(access_token, user_id):
+    """
+    Whether the token's login predates the user's last revocation. Tokens
+    without the millisecond auth_time_ms claim fall back to their whole-second
+    `iat`, treating a token from the same second as revoked.
+    """
+    revoked_at_ms = await cache.aget(token_revocation_key(user_id))
+    if revoked_at_ms is None:
+        return False
+    auth_time_ms = access_token.get('auth_time_ms')
+    if auth_time_ms is None:
+        return access_token.get('iat', 0) * 1000 <= revoked_at_ms
+    return auth_time_ms < revoked_at_ms
+
+async def get_user_from_token(token_string):
+    """
+    Builds the connection's user from a JWT access token.
+
+    Tokens carrying the seller_id claim become a TokenUser straight from the
+    signed claims; the only lookup is the revocation entry in the cache, so
+    accepting a socket needs no database access.
+    """
+    try:
+        # Validate the token (signature and expiry)
         access_token = AccessToken(token_string)
-        # Get the user ID from the token's payload
-        user_id = access_token.get('user_id')
-        # Fetch the user from the database
-        return User.objects.get(id=user_id)
-    except (InvalidToken, TokenError, User.DoesNotExist):
-        # If token is invalid or user doesn't exist, return AnonymousUser
+    except (InvalidToken, TokenError):
+        # If token is invalid, return AnonymousUser
         return AnonymousUser()
 
+    user_id = access_token.get('user_id')
+    if await is_token_revoked(access_token, user_id):
+        return AnonymousUser()
+
+    if access_token.get('seller_id') is None:
+        return await get_user_from_db(user_id)
+    return TokenUser(access_token)
+
 class TokenAuthMiddleware:
     """
     Custom middleware for Django Channels that authenticates users using a JWT token
@@ -48,4 +83,4 @@ class TokenAuthMiddleware:
             scope['user'] = AnonymousUser()
 
         # Call the next middleware or consumer in the stack
-        return await self.inner(scope, receive, send)
\ No newline at end of file
+        return await self.inner(scope, receive, send)
@@ -0,0 +1,69 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+
+class SparseFieldsMixin:
+    """
+    Lets list and detail reads ask for less:
+
+    - `?fields=id,status` drops every other field from the serialized output
+      (and lets the view skip loading what those fields would need).
+    - `?view=summary` serves the list straight from `.values(*summary_fields)`,
+      without model instances or serializers. `to_summary()` can reshape each
+      row to match the full representation; `?fields=` applies to it too.
+    """
+    summary_fields = ()
+
+    def requested_fields(self):
+        """The set of fields asked for with `?fields=`, or None for all of them."""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        value = self.request.query_params.get('fields')
+        if not value:
+            return None
+        fields = {field.strip() for field in value.split(',') if field.strip()}
+        unknown = fields - set(self.get_serializer_class()().fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.requested_fields()
+        if fields is not None:
+            # List serializers wrap the per-object serializer in `child`
+            target = getattr(serializer, 'child', serializer)
+            for name in set(target.fields) - fields:
+                target.fields.pop(name)
+        return serializer
+
+    def to_summary(self, row):
+        return row
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('view') != 'summary' or not self.summary_fields:
+            return super().list(request, *args, **kwargs)
+
+        fields = self.requested_fields()
+        # The JSON renderer turns Decimals into floats; the serializer's own
+        # fields render them as fixed-point strings, so use those
+        serializer_fields = self.get_serializer_class()().fields
+        decimal_fields = {
+            name: serializer_fields[name] for name in self.summary_fields
+            if isinstance(serializer_fields.get(name), serializers.DecimalField)
+        }
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*self.summary_fields)
+        page = self.paginate_queryset(queryset)
+        rows = []
+        for row in (queryset if page is None else page):
+            for name, field in decimal_fields.items():
+                if row[name] is not None:
+                    row[name] = field.to_representation(row[name])
+            rows.append(self.to_summary(row))
+        if fields is not None:
+            rows = [{key: value for key, value in row.items() if key in fields} for row in rows]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
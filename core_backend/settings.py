@@ -16,6 +16,8 @@ import os
 
 import dj_database_url
 
+from core_backend.channel_layers import channel_layer_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -61,6 +63,7 @@ INSTALLED_APPS = [
     'products',
     'whatsapp_comms',
     'orders',
+    'payments',
     'analytics',
     'rest_framework',
     'rest_framework_simplejwt', 
@@ -89,6 +92,9 @@ ALLOWED_HOSTS = [
 
 ]  # Add your ngrok URL or any other allowed hosts
 
+# Lets the dashboard read the watermark of streaming exports (see core_backend.exports)
+CORS_EXPOSE_HEADERS = ['X-Export-Watermark']
+
 # Get the frontend URL from the environment variables
 FRONTEND_URL = config('FRONTEND_URL', default=None)
 
@@ -184,17 +190,30 @@ else:
 #     }
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+# Comma-separated Redis URLs the channel layer shards across (defaults to REDIS_URL)
+REDIS_URLS = [url.strip() for url in config('REDIS_URLS', default=REDIS_URL).split(',') if url.strip()]
+
+# 'core' (RedisChannelLayer) or 'pubsub' (RedisPubSubChannelLayer);
+# compare them with `manage.py benchmark_inbox_fanout`
+CHANNEL_LAYER_BACKEND = config('CHANNEL_LAYER_BACKEND', default='core')
 
 CHANNEL_LAYERS = {
+    "default": channel_layer_config(
+        CHANNEL_LAYER_BACKEND,
+        REDIS_URLS,
+        # optional tuning (core layer only)
+        capacity=config('CHANNEL_LAYER_CAPACITY', default=1000, cast=int),
+        expiry=config('CHANNEL_LAYER_EXPIRY', default=60, cast=int),
+    ),
+}
+
+# Shared cache (M-Pesa access tokens, single-flight locks, etc.)
+# Uses the same Redis as the channel layer so every worker sees the same entries.
+CACHES = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {
-            "hosts": [REDIS_URL],
-            # optional tuning
-            "capacity": 1000,
-            "expiry": 60,
-        },
-    },
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
 }
 
 # Whatsapp API configuration
@@ -203,11 +222,74 @@ WHATSAPP_ACCESS_TOKEN = config('WHATSAPP_ACCESS_TOKEN', default='')
 WHATSAPP_PHONE_NUMBER_ID = config('WHATSAPP_PHONE_NUMBER_ID', default='')
 WHATSAPP_VERIFY_TOKEN = config('WHATSAPP_VERIFY_TOKEN', default='')
 
+# Outbox relay (deferred WhatsApp messages and inbox events)
+OUTBOX_RELAY_POLL_INTERVAL = config('OUTBOX_RELAY_POLL_INTERVAL', default=0.5, cast=float)
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=10, cast=int)
+# Failed events are retried after OUTBOX_RETRY_BASE_DELAY seconds, doubling on
+# every attempt up to OUTBOX_RETRY_MAX_DELAY
+OUTBOX_RETRY_BASE_DELAY = config('OUTBOX_RETRY_BASE_DELAY', default=5, cast=int)
+OUTBOX_RETRY_MAX_DELAY = config('OUTBOX_RETRY_MAX_DELAY', default=3600, cast=int)
+# A claimed batch becomes available to other relays again after this many
+# seconds, in case the relay that claimed it died while publishing
+OUTBOX_CLAIM_TIMEOUT_SECONDS = config('OUTBOX_CLAIM_TIMEOUT_SECONDS', default=300, cast=int)
+
+# Per-seller inbox event history kept in Redis so reconnecting dashboards can
+# replay what they missed; older gaps fall back to a full resync
+INBOX_STREAM_MAXLEN = config('INBOX_STREAM_MAXLEN', default=1000, cast=int)
+# Inbox events arriving within this window go out as one batch frame (with 0,
+# events only batch up while a slow client is still receiving the previous frame)
+INBOX_COALESCE_WINDOW_MS = config('INBOX_COALESCE_WINDOW_MS', default=50, cast=int)
+# A dashboard is disconnected (and told to resync) once its send queue holds
+# this many frames or its oldest queued or unacknowledged frame is this many
+# seconds old
+INBOX_SEND_QUEUE_SIZE = config('INBOX_SEND_QUEUE_SIZE', default=500, cast=int)
+INBOX_MAX_LAG_SECONDS = config('INBOX_MAX_LAG_SECONDS', default=15, cast=float)
+# Frames sent to an acking dashboard (?acks=1) that it hasn't acknowledged yet
+# before the consumer stops writing and lets events queue up
+INBOX_MAX_UNACKED_FRAMES = config('INBOX_MAX_UNACKED_FRAMES', default=50, cast=int)
+# Missed events replayed on reconnect are sent this many to a batch frame; a
+# gap longer than INBOX_SEND_QUEUE_SIZE gets a resync instead
+INBOX_REPLAY_BATCH_SIZE = config('INBOX_REPLAY_BATCH_SIZE', default=100, cast=int)
+# Conversation list updates are sent at most this often per conversation;
+# in between, only the latest version of the row is kept
+INBOX_CONVERSATION_UPDATE_INTERVAL_MS = config('INBOX_CONVERSATION_UPDATE_INTERVAL_MS', default=1000, cast=int)
+
+# Rows fetched per round trip by the streaming CSV/NDJSON exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Export watermarks trail the clock by this much, so rows written by
+# transactions still in flight are left to the next export rather than missed
+EXPORT_WATERMARK_LAG_SECONDS = config('EXPORT_WATERMARK_LAG_SECONDS', default=60, cast=int)
+
+# Bulk product imports: largest accepted file, and rows per INSERT ... ON CONFLICT
+PRODUCT_IMPORT_MAX_ROWS = config('PRODUCT_IMPORT_MAX_ROWS', default=10000, cast=int)
+PRODUCT_IMPORT_BATCH_SIZE = config('PRODUCT_IMPORT_BATCH_SIZE', default=500, cast=int)
+
+# How often (seconds) the WhatsApp order parser checks a seller's catalog for changes
+CATALOG_MATCHER_REFRESH_SECONDS = config('CATALOG_MATCHER_REFRESH_SECONDS', default=5, cast=float)
+
+# How long stock stays reserved for a checkout that hasn't been paid (seconds)
+STOCK_RESERVATION_TTL_SECONDS = config('STOCK_RESERVATION_TTL_SECONDS', default=900, cast=int)
+
 # Mpesa Pay configuration
 MPESA_CONSUMER_KEY = config('MPESA_CONSUMER_KEY', default='')
 MPESA_CONSUMER_SECRET = config('MPESA_CONSUMER_SECRET', default='')
 MPESA_SHORTCODE = config('MPESA_SHORTCODE', default='')
 MPESA_PASSKEY = config('MPESA_PASSKEY', default='')
+# Point this at the local Daraja stand-in for load tests
+MPESA_API_BASE_URL = config('MPESA_API_BASE_URL', default='https://sandbox.safaricom.co.ke').rstrip('/')
+# Overrides the callback URL built from APP_DOMAIN
+MPESA_CALLBACK_URL = config('MPESA_CALLBACK_URL', default='')
+# Refresh the cached OAuth token this many seconds before Safaricom expires it
+MPESA_TOKEN_REFRESH_MARGIN = config('MPESA_TOKEN_REFRESH_MARGIN', default=300, cast=int)
+# How often the payment worker looks for new checkout requests (seconds)
+PAYMENT_WORKER_POLL_INTERVAL = config('PAYMENT_WORKER_POLL_INTERVAL', default=1.0, cast=float)
+# An order claimed for an STK push this long ago without a result belongs to a
+# worker that died mid-push; it is failed rather than pushed a second time
+PAYMENT_CLAIM_TIMEOUT_SECONDS = config('PAYMENT_CLAIM_TIMEOUT_SECONDS', default=300, cast=int)
+# How often the payment worker sweeps for such claims, even while it has a backlog
+PAYMENT_CLAIM_SWEEP_INTERVAL = config('PAYMENT_CLAIM_SWEEP_INTERVAL', default=30.0, cast=float)
+# Orders left in PENDING_PAYMENT this long without a callback are reconciled via STK query
+MPESA_RECONCILE_AFTER_MINUTES = config('MPESA_RECONCILE_AFTER_MINUTES', default=5, cast=int)
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -262,6 +344,11 @@ REST_FRAMEWORK = {
     ),
 }
 
+SIMPLE_JWT = {
+    # Embeds username and seller_id claims for stateless WebSocket auth
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.SellerTokenObtainPairSerializer',
+}
+
 # Logging configuration to help debug channel layer issues
 LOGGING = {
     'version': 1,
@@ -0,0 +1,90 @@
+"""
+Per-seller change versions, kept in the shared cache, and conditional GET
+support built on them.
+
+Every write that can change what a seller's dashboard shows bumps the
+seller's version for that resource ("products", "orders") once the
+transaction commits: model saves and deletes through signals, and bulk
+UPDATEs explicitly. A list, detail or analytics response carries an ETag
+derived from those versions, so an unchanged resource is answered with
+304 Not Modified after a single cache lookup, without running its queries.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def _version_key(resource, seller_pk):
+    return f'seller_version:{resource}:{seller_pk}'
+
+
+def _fresh_version():
+    # Used when a counter is missing (first use or evicted); larger than any
+    # value a client could still hold from before
+    return int(time.time() * 1000)
+
+
+def _bump(resource, seller_pks):
+    for seller_pk in seller_pks:
+        key = _version_key(resource, seller_pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def bump_seller_version(resource, *seller_pks):
+    """Marks a resource as changed for the given sellers once the current transaction commits."""
+    seller_pks = {pk for pk in seller_pks if pk is not None}
+    if seller_pks:
+        transaction.on_commit(lambda: _bump(resource, seller_pks))
+
+
+def get_seller_versions(resources, seller_pk):
+    """Current versions of several resources for one seller, with one cache round trip."""
+    keys = [_version_key(resource, seller_pk) for resource in resources]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _fresh_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+class ConditionalGetMixin:
+    """
+    Answers GETs with 304 Not Modified while the seller's `version_resources`
+    are unchanged. The ETag also covers the user and the full path, so
+    filters, cursors and `?fields=` each validate separately.
+    """
+    version_resources = ()
+
+    def get_etag(self, request):
+        versions = get_seller_versions(self.version_resources, request.user.pk)
+        digest = hashlib.md5(f'{request.user.pk}:{versions}:{request.get_full_path()}'.encode()).hexdigest()
+        return f'W/"{digest}"'
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag = self.get_etag(request)
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            # Browsers keep the copy but revalidate it on every use
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -10,7 +10,7 @@ class OrderAdmin(admin.ModelAdmin):
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'product', 'quantity', 'price_at_time_of_purchase')
+    list_display = ('id', 'order', 'product_name', 'product_sku', 'quantity', 'price_at_time_of_purchase')
     list_filter = ('order__status', 'product')
-    search_fields = ('order__customer__phone_number', 'product__name')
-    readonly_fields = ('price_at_time_of_purchase',)
\ No newline at end of file
+    search_fields = ('order__customer__phone_number', 'product_name', 'product_sku')
+    readonly_fields = ('price_at_time_of_purchase', 'product_name', 'product_sku', 'product_image')
\ No newline at end of file
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_order_mpesa_checkout_request_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('IN_PROGRESS', 'In Progress (Cart)'), ('PAYMENT_REQUESTED', 'Payment Requested'), ('PENDING_PAYMENT', 'Pending Payment'), ('PENDING_APPROVAL', 'Pending Approval'), ('PROCESSING', 'Processing'), ('READY_FOR_PICKUP', 'Ready for Pickup'), ('OUT_FOR_DELIVERY', 'Out for Delivery'), ('DELIVERED', 'Delivered'), ('PICKED_UP', 'Picked Up'), ('CANCELLED', 'Cancelled'), ('FAILED', 'Failed')], default='IN_PROGRESS', max_length=20),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def _primary_image(images):
+    image = (images or [''])[0]
+    if isinstance(image, dict):
+        image = image.get('url', '')
+    return str(image or '')[:500]
+
+
+def backfill_product_snapshot(apps, schema_editor):
+    """
+    Copies name, SKU and first image from each item's product, a batch of
+    items per transaction so no long-running lock is held on a large table.
+    Items whose product was already deleted keep an empty name.
+    """
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            items = list(
+                OrderItem.objects.filter(id__gt=last_id, product__isnull=False)
+                .select_related('product')
+                .only('id', 'product__name', 'product__sku', 'product__images')
+                .order_by('id')[:BATCH_SIZE]
+            )
+            if not items:
+                return
+            for item in items:
+                item.product_name = item.product.name
+                item.product_sku = item.product.sku
+                item.product_image = _primary_image(item.product.images)
+            OrderItem.objects.bulk_update(items, ['product_name', 'product_sku', 'product_image'])
+        last_id = items[-1].id
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('orders', '0006_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_snapshot, migrations.RunPython.noop),
+    ]
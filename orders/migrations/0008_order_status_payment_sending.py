@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_backfill_orderitem_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('IN_PROGRESS', 'In Progress (Cart)'), ('PAYMENT_REQUESTED', 'Payment Requested'), ('PAYMENT_SENDING', 'Sending Payment Request'), ('PENDING_PAYMENT', 'Pending Payment'), ('PENDING_APPROVAL', 'Pending Approval'), ('PROCESSING', 'Processing'), ('READY_FOR_PICKUP', 'Ready for Pickup'), ('OUT_FOR_DELIVERY', 'Out for Delivery'), ('DELIVERED', 'Delivered'), ('PICKED_UP', 'Picked Up'), ('CANCELLED', 'Cancelled'), ('FAILED', 'Failed')], default='IN_PROGRESS', max_length=20),
+        ),
+    ]
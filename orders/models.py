@@ -1,5 +1,8 @@
 from django.db import models
 from django.db.models import Sum, F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core_backend.versions import bump_seller_version
 from sellers.models import SellerProfile
 from whatsapp_comms.models import Customer
 from products.models import Product
@@ -7,6 +10,9 @@ from products.models import Product
 class Order(models.Model):
     class OrderStatus(models.TextChoices):
         IN_PROGRESS = 'IN_PROGRESS', 'In Progress (Cart)'
+        PAYMENT_REQUESTED = 'PAYMENT_REQUESTED', 'Payment Requested'
+        # Claimed by a payment worker, STK push in flight
+        PAYMENT_SENDING = 'PAYMENT_SENDING', 'Sending Payment Request'
         PENDING_PAYMENT = 'PENDING_PAYMENT', 'Pending Payment'
         PENDING_APPROVAL = 'PENDING_APPROVAL', 'Pending Approval'
         PROCESSING = 'PROCESSING', 'Processing'
@@ -42,6 +48,24 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Used by the payment reconciliation poller to find stale PENDING_PAYMENT orders
+            models.Index(fields=['status', 'updated_at'], name='order_status_updated_idx'),
+            # The seller's order list, newest first, optionally narrowed by status or customer
+            models.Index(fields=['seller', '-created_at', '-id'], name='order_seller_created_idx'),
+            models.Index(fields=['seller', 'status', '-created_at', '-id'], name='order_seller_status_idx'),
+            models.Index(fields=['seller', 'customer', '-created_at', '-id'], name='order_seller_customer_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the version signal tell a cart that stays a cart from one leaving it
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
     def __str__(self):
         return f"Order {self.id} for {self.customer}"
 
@@ -69,5 +93,46 @@ class OrderItem(models.Model):
     # Store chosen size, color, etc.
     selected_size = models.CharField(max_length=50, blank=True, null=True)
 
+    # Snapshot of the product when it was added to the cart, so carts, order
+    # history and analytics read this table alone and survive product edits/deletes
+    product_name = models.CharField(max_length=255, blank=True, default='')
+    product_sku = models.CharField(max_length=100, blank=True, null=True)
+    product_image = models.CharField(max_length=500, blank=True, default='')
+
+    @staticmethod
+    def product_snapshot(product):
+        """The snapshot fields for an item of `product`."""
+        image = (product.images or [''])[0]
+        if isinstance(image, dict):
+            image = image.get('url', '')
+        return {
+            'product_name': product.name,
+            'product_sku': product.sku,
+            'product_image': str(image or '')[:500],
+        }
+
     def __str__(self):
-        return f"{self.quantity} x {self.product.name if self.product else 'Deleted Product'}"
+        return f"{self.quantity} x {self.product_name or 'Deleted Product'}"
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def bump_orders_version(sender, instance, **kwargs):
+    # Invalidates the seller's cached order list and analytics (see core_backend.versions).
+    # Carts are left out of both, so editing one that stays a cart changes nothing.
+    cart = Order.OrderStatus.IN_PROGRESS
+    if instance.status == cart and getattr(instance, '_loaded_status', cart) == cart:
+        return
+    bump_seller_version('orders', instance.seller_id)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def bump_orders_version_for_item(sender, instance, **kwargs):
+    if OrderItem.order.is_cached(instance):
+        seller_id, status = instance.order.seller_id, instance.order.status
+    else:
+        seller_id, status = Order.objects.filter(pk=instance.order_id).values_list('seller_id', 'status').first() or (None, None)
+    if seller_id is None or status == Order.OrderStatus.IN_PROGRESS:
+        return
+    bump_seller_version('orders', seller_id)
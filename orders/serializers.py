@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
-from products.serializers import ProductSerializer # To nest product details
 from whatsapp_comms.models import Customer # To get customer details
+from .transitions import transition_error
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,11 +9,14 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = ['phone_number', 'name']
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True) # Nest full product details
-
+    # Product details come from the snapshot taken at add-to-cart time, so
+    # rendering items needs no product lookups; `product` is just the id
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'quantity', 'price_at_time_of_purchase', 'selected_size']
+        fields = [
+            'id', 'product', 'product_name', 'product_sku', 'product_image',
+            'quantity', 'price_at_time_of_purchase', 'selected_size',
+        ]
 
 class OrderSerializer(serializers.ModelSerializer):
     # Nesting serializers to provide rich data in one API call
@@ -27,4 +30,17 @@ class OrderSerializer(serializers.ModelSerializer):
             'delivery_address_text', 'created_at', 'updated_at', 'items'
         ]
         # Make status updatable via PATCH requests
-        read_only_fields = ['id', 'customer', 'total_amount', 'created_at', 'updated_at', 'items']
\ No newline at end of file
+        read_only_fields = ['id', 'customer', 'total_amount', 'created_at', 'updated_at', 'items']
+
+    def validate_status(self, value):
+        """Sellers can only move an order along SELLER_TRANSITIONS."""
+        if self.instance is not None and value != self.instance.status:
+            error = transition_error(self.instance.status, value)
+            if error:
+                raise serializers.ValidationError(error)
+        return value
+
+
+class BulkStatusUpdateSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    status = serializers.ChoiceField(choices=Order.OrderStatus.choices)
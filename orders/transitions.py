@@ -0,0 +1,100 @@
+"""
+Seller-driven order status changes and the notifications they trigger.
+
+Payment-driven statuses (PENDING_PAYMENT -> PENDING_APPROVAL / FAILED) are
+applied by payments.processing; this module covers what the dashboard does
+after that.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core_backend.versions import bump_seller_version
+from whatsapp_comms.outbox import enqueue_events, inbox_event, whatsapp_message_event
+from .models import Order
+
+Status = Order.OrderStatus
+
+# Status -> statuses a seller may move an order to from there
+SELLER_TRANSITIONS = {
+    Status.PENDING_APPROVAL: {Status.PROCESSING, Status.CANCELLED},
+    Status.PROCESSING: {Status.OUT_FOR_DELIVERY, Status.READY_FOR_PICKUP, Status.CANCELLED},
+    Status.READY_FOR_PICKUP: {Status.PICKED_UP, Status.CANCELLED},
+    Status.OUT_FOR_DELIVERY: {Status.DELIVERED},
+}
+
+# What the customer is told when their order reaches a status
+CUSTOMER_MESSAGES = {
+    Status.PROCESSING: "👍 Your order *#{id}* has been approved and is being prepared.",
+    Status.OUT_FOR_DELIVERY: "🚚 Your order *#{id}* is out for delivery.",
+    Status.READY_FOR_PICKUP: "📦 Your order *#{id}* is ready for pickup.",
+    Status.DELIVERED: "✅ Your order *#{id}* has been delivered. Thank you for shopping with us!",
+    Status.PICKED_UP: "✅ Your order *#{id}* has been picked up. Thank you for shopping with us!",
+    Status.CANCELLED: "❌ Your order *#{id}* has been cancelled. Reply 'menu' if you need anything else.",
+}
+
+
+def transition_error(current_status, new_status):
+    """Why a seller can't move an order from current_status to new_status, or None if they can."""
+    if new_status not in SELLER_TRANSITIONS.get(current_status, ()):
+        return f"Cannot change an order from {current_status} to {new_status}."
+    return None
+
+
+def status_change_events(order):
+    """Unsaved outbox events for an order that just reached its current status."""
+    events = [inbox_event(order.seller_id, {
+        'type': 'order_status_update',
+        'order': {
+            'id': order.id,
+            'status': order.status,
+            'status_display': order.get_status_display(),
+            'updated_at': order.updated_at.isoformat(),
+        },
+    })]
+    message = CUSTOMER_MESSAGES.get(order.status)
+    if message and order.customer_id:
+        events.append(whatsapp_message_event(order.customer_id, message.format(id=order.id)))
+    return events
+
+
+def bulk_transition(seller_pk, order_ids, new_status):
+    """
+    Moves many of a seller's orders to new_status in one transaction: the
+    rows are locked, each transition is checked, the valid ones are written
+    with a single UPDATE and their notifications are queued with one INSERT.
+
+    Returns (updated order ids, {order id: error}).
+    """
+    errors = {}
+    with transaction.atomic():
+        orders = {
+            order.id: order
+            for order in Order.objects.select_for_update()
+            .filter(seller_id=seller_pk, pk__in=order_ids)
+            .exclude(status=Status.IN_PROGRESS)
+            .only('id', 'seller_id', 'customer_id', 'status', 'updated_at')
+        }
+        valid = []
+        for order_id in dict.fromkeys(order_ids):
+            order = orders.get(order_id)
+            if order is None:
+                errors[order_id] = "Order not found."
+                continue
+            error = transition_error(order.status, new_status)
+            if error:
+                errors[order_id] = error
+                continue
+            valid.append(order)
+
+        if valid:
+            now = timezone.now()
+            Order.objects.filter(pk__in=[order.id for order in valid]).update(status=new_status, updated_at=now)
+            events = []
+            for order in valid:
+                order.status, order.updated_at = new_status, now
+                events.extend(status_change_events(order))
+            enqueue_events(events)
+            # update() sends no signals
+            bump_seller_version('orders', seller_pk)
+
+    return [order.id for order in valid], errors
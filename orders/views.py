@@ -1,14 +1,84 @@
-from rest_framework import viewsets, permissions
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import mixins, viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core_backend.exports import export_window, iterate, stream_export
+from core_backend.mixins import SparseFieldsMixin
+from core_backend.versions import ConditionalGetMixin
+from whatsapp_comms.outbox import enqueue_events
 from .models import Order
-from .serializers import OrderSerializer
+from .pagination import OrderCursorPagination
+from .serializers import BulkStatusUpdateSerializer, OrderSerializer
+from .transitions import bulk_transition, status_change_events
+
+
+# Export columns: one CSV row per line item; NDJSON nests the items per order
+ORDER_EXPORT_COLUMNS = [
+    'order_id', 'status', 'created_at', 'updated_at', 'customer_phone', 'customer_name',
+    'total_amount', 'delivery_option', 'delivery_address', 'payment_receipt',
+]
+ITEM_EXPORT_COLUMNS = ['item_id', 'product_id', 'product_name', 'sku', 'quantity', 'unit_price', 'size']
+
+
+def _orders_with_items(rows):
+    """Folds consecutive line-item rows of the same order into one order with an `items` list."""
+    for _, order_rows in groupby(rows, key=itemgetter('order_id')):
+        order_rows = list(order_rows)
+        order = {column: order_rows[0][column] for column in ORDER_EXPORT_COLUMNS}
+        order['items'] = [
+            {column: row[column] for column in ITEM_EXPORT_COLUMNS}
+            for row in order_rows if row['item_id'] is not None
+        ]
+        yield order
+
 
-class OrderViewSet(viewsets.ModelViewSet):
+def _parse_date_param(name, value, next_day=False):
+    """
+    Parses an ISO date or datetime query parameter into an aware datetime.
+    A plain date means its midnight, or the following midnight with next_day
+    (so `created_before=2025-01-31` includes the 31st).
+    """
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: "Expected an ISO 8601 date or datetime."})
+        parsed = datetime.combine(day + timedelta(days=1) if next_day else day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class OrderViewSet(ConditionalGetMixin, SparseFieldsMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                   mixins.UpdateModelMixin, viewsets.GenericViewSet):
     """
     API endpoint that allows retailers to view and manage their orders.
+
+    The list is cursor-paginated, newest first, and can be filtered with
+    `status` (comma-separated), `created_after` / `created_before`
+    (ISO date or datetime) and `customer` (phone number). `?view=summary`
+    returns just the columns the orders table shows. Reads answer 304 while
+    the seller's orders are unchanged.
+
+    POST `bulk_status/` moves many orders to one status at once, and
+    `export/` streams every order with its line items as CSV or NDJSON.
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
-    http_method_names = ['get', 'patch', 'head', 'options'] # Allow list, retrieve, and partial_update
+    pagination_class = OrderCursorPagination
+    http_method_names = ['get', 'post', 'patch', 'head', 'options'] # List, retrieve, partial_update and bulk_status
+    summary_fields = ('id', 'customer_id', 'customer__name', 'status', 'total_amount', 'created_at')
+    # Line items carry their own product snapshot, so product edits don't matter
+    version_resources = ('orders',)
 
     def get_queryset(self):
         """
@@ -16,11 +86,106 @@ class OrderViewSet(viewsets.ModelViewSet):
         for the currently authenticated seller's profile.
         We exclude 'IN_PROGRESS' orders as those are carts.
         """
-        return Order.objects.filter(seller=self.request.user.seller_profile)\
+        queryset = Order.objects.filter(seller_id=self.request.user.pk)\
                             .exclude(status=Order.OrderStatus.IN_PROGRESS)\
-                            .order_by('-created_at')
+                            .select_related('customer')\
+                            .order_by('-created_at', '-id')
+        fields = self.requested_fields()
+        if fields is None or 'items' in fields:
+            # Line items are loaded in one query per page instead of one per order
+            queryset = queryset.prefetch_related('items')
+        if self.action == 'list':
+            queryset = self.filter_queryset_by_params(queryset)
+        return queryset
+
+    def filter_queryset_by_params(self, queryset):
+        params = self.request.query_params
+
+        statuses = [status for status in params.get('status', '').split(',') if status]
+        if statuses:
+            unknown = set(statuses) - set(Order.OrderStatus.values)
+            if unknown:
+                raise ValidationError({'status': f"Unknown status: {', '.join(sorted(unknown))}."})
+            queryset = queryset.filter(status__in=statuses)
+
+        # Plain range comparisons on created_at so the composite indexes apply
+        if params.get('created_after'):
+            queryset = queryset.filter(created_at__gte=_parse_date_param('created_after', params['created_after']))
+        if params.get('created_before'):
+            queryset = queryset.filter(
+                created_at__lt=_parse_date_param('created_before', params['created_before'], next_day=True)
+            )
+
+        if params.get('customer'):
+            queryset = queryset.filter(customer_id=params['customer'])
+        return queryset
+
+    def to_summary(self, row):
+        # Same shape as OrderSerializer, so the dashboard can use either
+        return {
+            'id': row['id'],
+            'customer': {'phone_number': row['customer_id'], 'name': row['customer__name']}
+            if row['customer_id'] else None,
+            'status': row['status'],
+            'total_amount': row['total_amount'],
+            'created_at': row['created_at'],
+        }
 
     def perform_update(self, serializer):
-        # We can add logic here later to trigger notifications on status change
-        # For now, just save the update.
-        serializer.save()
\ No newline at end of file
+        # The customer and the dashboard are notified through the outbox, in
+        # the same transaction as the status change
+        previous_status = serializer.instance.status
+        with transaction.atomic():
+            order = serializer.save()
+            if order.status != previous_status:
+                enqueue_events(status_change_events(order))
+
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """
+        Moves many orders to one status: {"order_ids": [...], "status": "..."}.
+        Valid transitions are applied together; the rest are reported per order.
+        """
+        serializer = BulkStatusUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated, errors = bulk_transition(
+            request.user.pk, serializer.validated_data['order_ids'], serializer.validated_data['status']
+        )
+        print(f"Bulk status update to {serializer.validated_data['status']}: {len(updated)} updated, {len(errors)} rejected")
+        return Response({'updated': updated, 'errors': errors})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams the seller's orders and line items (`?output=csv|ndjson`).
+        With `?since=<previous X-Export-Watermark>` only orders changed since
+        the last export are included.
+        """
+        output, since, watermark = export_window(request)
+        orders = Order.objects.filter(seller_id=request.user.pk, updated_at__lt=watermark)\
+                              .exclude(status=Order.OrderStatus.IN_PROGRESS)
+        if since is not None:
+            orders = orders.filter(updated_at__gte=since)
+
+        # One row per line item (or per order without items), read as plain
+        # values through a server-side cursor
+        rows = iterate(
+            orders.order_by('updated_at', 'id', 'items__id').values(
+                'status', 'created_at', 'updated_at', 'total_amount', 'delivery_option',
+                order_id=F('id'),
+                customer_phone=F('customer_id'),
+                customer_name=F('customer__name'),
+                delivery_address=F('delivery_address_text'),
+                payment_receipt=F('payments_transaction_id'),
+                item_id=F('items__id'),
+                product_id=F('items__product_id'),
+                product_name=F('items__product_name'),
+                sku=F('items__product_sku'),
+                quantity=F('items__quantity'),
+                unit_price=F('items__price_at_time_of_purchase'),
+                size=F('items__selected_size'),
+            )
+        )
+        if output == 'csv':
+            return stream_export(request, rows, ORDER_EXPORT_COLUMNS + ITEM_EXPORT_COLUMNS, output, 'orders', watermark)
+        return stream_export(request, _orders_with_items(rows), ORDER_EXPORT_COLUMNS, output, 'orders', watermark)
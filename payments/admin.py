@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import PaymentEvent
 
-# Register your models here.
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'checkout_request_id', 'receipt_number', 'amount', 'order', 'created_at')
+    list_filter = ('event_type',)
+    search_fields = ('checkout_request_id', 'receipt_number')
+    readonly_fields = [f.name for f in PaymentEvent._meta.fields]
@@ -0,0 +1,215 @@
+import math
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.models import Order
+from payments.worker import process_next_payment_request
+from products.models import Product
+from sellers.models import SellerProfile
+from whatsapp_comms.models import Conversation, Customer
+from whatsapp_comms.views import process_message
+
+UNSETTLED = (Order.OrderStatus.PAYMENT_REQUESTED, Order.OrderStatus.PAYMENT_SENDING, Order.OrderStatus.PENDING_PAYMENT)
+
+
+def _text(body):
+    return {'type': 'text', 'text': {'body': body}}
+
+
+def _button(reply_id):
+    return {'type': 'interactive', 'interactive': {'type': 'button_reply', 'button_reply': {'id': reply_id}}}
+
+
+def _percentiles(values):
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p95 = values[math.ceil(len(values) * 0.95) - 1]
+    return f"p50={statistics.median(values):.2f}s p95={p95:.2f}s max={values[-1]:.2f}s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Pushes N concurrent customers through the bot checkout flow and waits for "
+        "their payments to settle. Run it against `run_daraja_simulator` (MPESA_API_BASE_URL) "
+        "with the web app serving MPESA_CALLBACK_URL. Reports end-to-end latency and, "
+        "on PostgreSQL, time spent waiting on row locks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=50)
+        parser.add_argument('--quantity', type=int, default=1, help="Units each customer buys.")
+        parser.add_argument('--stock', type=int, help="Units in stock (defaults to enough for everyone).")
+        parser.add_argument('--workers', type=int, default=2,
+                            help="Payment workers to run in-process; 0 if run_payment_worker is running separately.")
+        parser.add_argument('--timeout', type=float, default=120, help="Seconds to wait for payments to settle.")
+        parser.add_argument('--keep', action='store_true', help="Keep the generated seller, orders and customers.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Daraja: {settings.MPESA_API_BASE_URL}")
+        user = get_user_model().objects.create_user(
+            username=f"loadtest-{uuid.uuid4().hex[:12]}", password=uuid.uuid4().hex
+        )
+        # The profile is created by the post_save signal on User
+        seller = SellerProfile.objects.get(user=user)
+        phones = []
+        try:
+            self._run(seller, phones, options)
+        finally:
+            if not options['keep']:
+                Order.objects.filter(seller=seller).delete()
+                Product.objects.filter(seller=seller).delete()
+                Customer.objects.filter(phone_number__in=phones).delete()
+                user.delete()
+
+    def _run(self, seller, phones, options):
+        customers = options['customers']
+        product = Product.objects.create(
+            seller=seller,
+            name="Loadtest widget",
+            price=1,
+            inventory_count=options['stock'] if options['stock'] is not None else customers * options['quantity'],
+        )
+
+        checkout_started = {}  # order id -> perf_counter at checkout
+        settled_at = {}  # order id -> perf_counter when a final status was seen
+        turn_latencies = []
+        rejected = []
+        worker_errors = []
+        lock = threading.Lock()
+        stop = threading.Event()
+        lock_samples = []
+
+        def customer_flow(index):
+            phone = f"2547{random.randint(10000000, 99999999)}"
+            try:
+                customer = Customer.objects.create(phone_number=phone)
+                with lock:
+                    phones.append(phone)
+                conversation = Conversation.objects.create(customer=customer, seller=seller)
+                steps = [
+                    _text('hi'),
+                    _text(f"{options['quantity']} {product.name}"),
+                    _button('view_cart'),
+                    _button('checkout'),
+                    _button('select_pickup'),
+                ]
+                for step_number, message in enumerate(steps):
+                    if step_number == len(steps) - 1:
+                        started = time.perf_counter()
+                    turn_started = time.perf_counter()
+                    reply = process_message(conversation, message)
+                    with lock:
+                        turn_latencies.append(time.perf_counter() - turn_started)
+
+                order = Order.objects.filter(customer=customer, seller=seller).order_by('-id').first()
+                with lock:
+                    if order is None or order.status not in UNSETTLED:
+                        rejected.append(reply)
+                    else:
+                        checkout_started[order.id] = started
+            except Exception as e:
+                with lock:
+                    rejected.append(f"{type(e).__name__}: {e}")
+            finally:
+                connection.close()
+
+        def payment_worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        if not process_next_payment_request():
+                            time.sleep(0.1)
+                    except Exception as e:
+                        with lock:
+                            worker_errors.append(f"{type(e).__name__}: {e}")
+                        time.sleep(0.1)
+            finally:
+                connection.close()
+
+        def settle_watcher():
+            try:
+                while not stop.is_set():
+                    with lock:
+                        pending = set(checkout_started) - set(settled_at)
+                    if pending:
+                        settled = Order.objects.filter(id__in=pending).exclude(status__in=UNSETTLED)
+                        now = time.perf_counter()
+                        with lock:
+                            settled_at.update((order_id, now) for order_id in settled.values_list('id', flat=True))
+                    time.sleep(0.2)
+            finally:
+                connection.close()
+
+        def lock_sampler():
+            # Sessions blocked on a heavyweight lock (row locks, SELECT ... FOR UPDATE)
+            sql = (
+                "SELECT count(*), COALESCE(max(EXTRACT(EPOCH FROM now() - state_change)), 0) "
+                "FROM pg_stat_activity WHERE wait_event_type = 'Lock' AND datname = current_database()"
+            )
+            try:
+                with connection.cursor() as cursor:
+                    while not stop.is_set():
+                        cursor.execute(sql)
+                        lock_samples.append((time.perf_counter(), *cursor.fetchone()))
+                        time.sleep(0.05)
+            finally:
+                connection.close()
+
+        background = [threading.Thread(target=payment_worker, daemon=True) for _ in range(options['workers'])]
+        background.append(threading.Thread(target=settle_watcher, daemon=True))
+        if connection.vendor == 'postgresql':
+            background.append(threading.Thread(target=lock_sampler, daemon=True))
+        for thread in background:
+            thread.start()
+
+        wall_started = time.perf_counter()
+        threads = [threading.Thread(target=customer_flow, args=(i,)) for i in range(customers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        deadline = time.perf_counter() + options['timeout']
+        while len(settled_at) < len(checkout_started) and time.perf_counter() < deadline:
+            time.sleep(0.2)
+        pending = set(checkout_started) - set(settled_at)
+        wall = time.perf_counter() - wall_started
+        stop.set()
+        for thread in background:
+            thread.join()
+
+        statuses = {}
+        for status in Order.objects.filter(id__in=checkout_started).values_list('status', flat=True):
+            statuses[status] = statuses.get(status, 0) + 1
+        end_to_end = [settled_at[order_id] - checkout_started[order_id] for order_id in settled_at]
+
+        self.stdout.write(f"{customers} customers in {wall:.1f}s")
+        self.stdout.write(f"checkouts started: {len(checkout_started)}, rejected: {len(rejected)}, unsettled: {len(pending)}")
+        self.stdout.write(f"final statuses: {statuses}")
+        self.stdout.write(f"bot turn latency: {_percentiles(turn_latencies)}")
+        self.stdout.write(f"checkout -> settled: {_percentiles(end_to_end)}")
+        if lock_samples:
+            # Integrate the sampled waiter count over time for an estimate of total lock wait
+            total_wait = sum(
+                count * (later[0] - sampled_at)
+                for (sampled_at, count, _), later in zip(lock_samples, lock_samples[1:])
+            )
+            self.stdout.write(
+                f"lock waits: ~{total_wait:.2f}s total, peak {max(s[1] for s in lock_samples)} waiting sessions, "
+                f"longest wait {max(float(s[2]) for s in lock_samples):.2f}s"
+            )
+        else:
+            self.stdout.write("lock waits: only sampled on PostgreSQL")
+        if worker_errors:
+            self.stdout.write(f"payment worker errors: {len(worker_errors)} (first: {worker_errors[0]})")
+        for reason in rejected[:5]:
+            self.stdout.write(f"  rejected: {reason}")
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.reconciliation import reconcile_pending_payments
+
+
+class Command(BaseCommand):
+    help = "Queries Daraja for orders stuck in PENDING_PAYMENT and applies the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=settings.MPESA_RECONCILE_AFTER_MINUTES,
+                            help="Only reconcile orders pending for at least this many minutes.")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=4, help="Maximum concurrent STK queries.")
+        parser.add_argument('--rate', type=float, default=5.0, help="Maximum STK queries per second.")
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Repeat every N seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = reconcile_pending_payments(
+                older_than_minutes=options['older_than'],
+                batch_size=options['batch_size'],
+                concurrency=options['concurrency'],
+                rate=options['rate'],
+            )
+            self.stdout.write(
+                f"Reconciliation run: {stats['checked']} checked, "
+                f"{stats['settled']} settled, {stats['unresolved']} unresolved."
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
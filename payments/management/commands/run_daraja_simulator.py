@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from payments.simulator import DarajaSimulator, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a local Daraja stand-in (OAuth, STK push, STK query) that posts "
+        "simulated STK results back to the callback URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--callback-delay', type=float, default=2.0, help="Mean seconds before the callback is sent.")
+        parser.add_argument('--delay-jitter', type=float, default=1.0, help="Callback delay varies by up to this many seconds.")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of pushes the customer cancels or can't pay.")
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help="Share of pushes that time out on the handset.")
+        parser.add_argument('--drop-rate', type=float, default=0.0, help="Share of callbacks never sent (left for reconciliation).")
+        parser.add_argument('--callback-url', help="Post callbacks here instead of the request's CallBackURL.")
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        simulator = DarajaSimulator(
+            callback_delay=options['callback_delay'],
+            delay_jitter=options['delay_jitter'],
+            failure_rate=options['failure_rate'],
+            timeout_rate=options['timeout_rate'],
+            drop_rate=options['drop_rate'],
+            callback_url=options['callback_url'],
+            seed=options['seed'],
+        )
+        server = make_server(simulator, options['host'], options['port'])
+        self.stdout.write(f"Daraja simulator listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Simulator stats: {simulator.stats}")
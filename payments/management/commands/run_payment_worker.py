@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payments.worker import fail_stale_payment_claims, process_next_payment_request
+
+
+class Command(BaseCommand):
+    help = "Sends M-Pesa STK pushes for orders the WhatsApp bot has marked PAYMENT_REQUESTED."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the pending requests once and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Payment worker started.")
+        last_sweep = None
+        while True:
+            # Keep going while there is work, only sleep once the queue is empty.
+            # Stale claims are swept on a timer so a backlog can't starve the sweep.
+            while True:
+                if last_sweep is None or time.monotonic() - last_sweep >= settings.PAYMENT_CLAIM_SWEEP_INTERVAL:
+                    fail_stale_payment_claims()
+                    last_sweep = time.monotonic()
+                if not process_next_payment_request():
+                    break
+            if options['once']:
+                break
+            time.sleep(settings.PAYMENT_WORKER_POLL_INTERVAL)
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0004_order_status_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('REQUESTED', 'STK Push Requested'), ('SUCCEEDED', 'Payment Succeeded'), ('FAILED', 'Payment Failed')], max_length=20)),
+                ('checkout_request_id', models.CharField(max_length=100)),
+                ('receipt_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('result_code', models.IntegerField(blank=True, null=True)),
+                ('result_desc', models.CharField(blank=True, max_length=255, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_events', to='orders.order')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='paymentevent',
+            constraint=models.UniqueConstraint(fields=('checkout_request_id', 'event_type'), name='unique_payment_event_per_checkout'),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_type__in', ['SUCCEEDED', 'FAILED'])), fields=('checkout_request_id',), name='unique_payment_outcome_per_checkout'),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('receipt_number__isnull', False)), fields=('receipt_number',), name='unique_payment_receipt_number'),
+        ),
+    ]
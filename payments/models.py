@@ -1,3 +1,58 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 
-# Create your models here.
+
+class PaymentEvent(models.Model):
+    """
+    Append-only ledger of M-Pesa payment events, kept apart from the Order row.
+    Rows are never updated, except that a success recorded without a receipt
+    number (from a reconciliation query) gets it when the callback arrives.
+    Uniqueness on CheckoutRequestID and receipt number makes replayed
+    callbacks cheap no-ops.
+    """
+    class EventType(models.TextChoices):
+        REQUESTED = 'REQUESTED', 'STK Push Requested'
+        SUCCEEDED = 'SUCCEEDED', 'Payment Succeeded'
+        FAILED = 'FAILED', 'Payment Failed'
+
+    order = models.ForeignKey('orders.Order', on_delete=models.SET_NULL, null=True, related_name='payment_events')
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    checkout_request_id = models.CharField(max_length=100)
+    receipt_number = models.CharField(max_length=50, blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    result_code = models.IntegerField(blank=True, null=True)
+    result_desc = models.CharField(max_length=255, blank=True, null=True)
+    # The raw Daraja payload, for audits and disputes
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checkout_request_id', 'event_type'], name='unique_payment_event_per_checkout'),
+            # An STK push has exactly one outcome, success or failure
+            models.UniqueConstraint(
+                fields=['checkout_request_id'],
+                condition=models.Q(event_type__in=['SUCCEEDED', 'FAILED']),
+                name='unique_payment_outcome_per_checkout',
+            ),
+            models.UniqueConstraint(
+                fields=['receipt_number'],
+                condition=models.Q(receipt_number__isnull=False),
+                name='unique_payment_receipt_number',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_event_type_display()} for {self.checkout_request_id}"
+
+    @classmethod
+    def record(cls, **fields):
+        """
+        Inserts an event, or returns None if an equivalent one is already in the
+        ledger. The insert runs in a savepoint so a duplicate doesn't break the
+        caller's transaction.
+        """
+        try:
+            with transaction.atomic():
+                return cls.objects.create(**fields)
+        except IntegrityError:
+            return None
@@ -0,0 +1,188 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core_backend.versions import bump_seller_version
+from orders.models import Order
+from products.inventory import commit_reservations, release_reservations
+from products.models import StockReservation
+# Customer and dashboard notifications are published by the outbox relay
+from whatsapp_comms.outbox import enqueue_whatsapp_message, enqueue_inbox_event
+from .models import PaymentEvent
+
+
+def _backfill_receipt(order, checkout_request_id, receipt_number):
+    """
+    Stores a receipt number on an outcome recorded without one (STK query
+    results used by reconciliation don't carry it) and on its order.
+    Returns True if anything was filled in.
+    """
+    try:
+        with transaction.atomic():
+            events = PaymentEvent.objects.filter(
+                checkout_request_id=checkout_request_id,
+                event_type=PaymentEvent.EventType.SUCCEEDED,
+                receipt_number__isnull=True,
+            ).update(receipt_number=receipt_number)
+    except IntegrityError:
+        # Already stored on another row
+        return False
+    orders = Order.objects.filter(
+        Q(payments_transaction_id__isnull=True) | Q(payments_transaction_id=''), pk=order.pk
+    ).update(payments_transaction_id=receipt_number, updated_at=timezone.now())
+    if orders:
+        bump_seller_version('orders', order.seller_id)
+    return bool(events or orders)
+
+
+def _order_for_checkout(checkout_request_id):
+    """
+    The order an STK push was sent for. Falls back to the ledger when the
+    order no longer carries the checkout id, e.g. a cart that was handed back
+    and checked out again.
+    """
+    try:
+        return Order.objects.select_related('customer').get(mpesa_checkout_request_id=checkout_request_id)
+    except Order.DoesNotExist:
+        event = (
+            PaymentEvent.objects.select_related('order__customer')
+            .filter(checkout_request_id=checkout_request_id, event_type=PaymentEvent.EventType.REQUESTED)
+            .exclude(order=None)
+            .first()
+        )
+        if event is None:
+            raise
+        return event.order
+
+
+def apply_stk_result(stk_callback):
+    """
+    Applies the outcome of an STK push: ledger event, order status, inventory
+    and notifications. `stk_callback` has the shape of Daraja's `Body.stkCallback`
+    (CheckoutRequestID, ResultCode, ResultDesc, CallbackMetadata).
+
+    Shared by the M-Pesa callback and the reconciliation poller so both paths
+    behave identically. Returns False if the order was already settled.
+    Raises Order.DoesNotExist for unknown checkout ids.
+    """
+    checkout_request_id = stk_callback.get('CheckoutRequestID')
+    result_code = stk_callback.get('ResultCode')
+    callback_metadata = {
+        item.get('Name'): item.get('Value')
+        for item in stk_callback.get('CallbackMetadata', {}).get('Item', [])
+    }
+    receipt_number = callback_metadata.get('MpesaReceiptNumber')
+
+    # A plain read: the order row is no longer locked for the callback
+    order = _order_for_checkout(checkout_request_id)
+
+    # Use a database transaction for safety
+    with transaction.atomic():
+        # --- Check 1: Record the outcome in the ledger; replays hit the unique constraints ---
+        event = PaymentEvent.record(
+            order=order,
+            event_type=PaymentEvent.EventType.SUCCEEDED if result_code == 0 else PaymentEvent.EventType.FAILED,
+            checkout_request_id=checkout_request_id,
+            receipt_number=receipt_number,
+            amount=callback_metadata.get('Amount'),
+            result_code=result_code,
+            result_desc=stk_callback.get('ResultDesc'),
+            payload=stk_callback,
+        )
+        if event is None:
+            if result_code == 0 and receipt_number and _backfill_receipt(order, checkout_request_id, receipt_number):
+                print(f"Stored receipt {receipt_number} for already settled Order #{order.id}.")
+            else:
+                print(f"Received a duplicate or late callback for already processed Order #{order.id}.")
+            return False
+
+        # --- Check 2: Derive the order status with one guarded UPDATE ---
+        new_status = Order.OrderStatus.PENDING_APPROVAL if result_code == 0 else Order.OrderStatus.FAILED
+        order_fields = {'status': new_status, 'updated_at': timezone.now()}
+        if receipt_number:
+            order_fields['payments_transaction_id'] = receipt_number
+        updated = Order.objects.filter(
+            pk=order.pk, status=Order.OrderStatus.PENDING_PAYMENT
+        ).update(**order_fields)
+        if not updated:
+            if result_code == 0:
+                # e.g. a push that was still in flight when its claim was failed as stale
+                print(
+                    f"WARNING: Payment {receipt_number} received for Order #{order.id}, which is no longer "
+                    f"pending payment. Refund or settle it manually."
+                )
+            else:
+                print(f"Order #{order.id} is no longer pending payment; ledger updated only.")
+            return False
+        for field, value in order_fields.items():
+            setattr(order, field, value)
+        bump_seller_version('orders', order.seller_id)
+
+        # --- Check 3: Was the payment successful? ---
+        if result_code == 0:
+            print(f"Payment successful for Order #{order.id}. Updating inventory.")
+
+            # Turn the checkout holds into sold stock; unheld lines fall back to
+            # one conditional UPDATE over inventory_count
+            order_items = list(order.items.all())
+            quantities = defaultdict(int)
+            for item in order_items:
+                if item.product_id:
+                    quantities[item.product_id] += item.quantity
+
+            unfilled_product_ids = commit_reservations(order, quantities)
+            for item in order_items:
+                if item.product_id in unfilled_product_ids:
+                    print(f"WARNING: Insufficient stock for Product ID {item.product_id} ({item.product_name}) on Order {order.id}.")
+                    # In a full system, you might flag this order for manual review
+
+            # --- Notify Customer ---
+            customer_phone = order.customer.phone_number
+            customer_message = (
+                f"✅ Payment successful!\n\n"
+                f"Thank you for your order. Your Order ID is *#{order.id}*.\n\n"
+                f"We have received your payment of KES {order.total_amount:.2f}. "
+                "We will begin processing it shortly."
+            )
+            # Notifications go through the outbox and are sent by the relay after
+            # commit, so a slow Meta API or Redis never holds the transaction open.
+            enqueue_whatsapp_message(customer_phone, customer_message)
+
+            # Prepare the data to send. We can serialize the order data.
+            # For now, a simple dictionary is fine for testing.
+            order_data_payload = {
+                'id': order.id,
+                'customer_name': order.customer.name or order.customer.phone_number,
+                'total_amount': str(order.total_amount),
+                'status': order.get_status_display(),
+                'created_at': order.created_at.isoformat(),
+            }
+
+            # The 'type' key in this dictionary ('new_order_notification') MUST
+            # match the name of a method in our InboxConsumer.
+            enqueue_inbox_event(order.seller_id, {
+                "type": "new_order_notification",
+                "order": order_data_payload
+            })
+            print(f"Queued 'new_order' notification for seller {order.seller_id}")
+        else:
+            # Payment failed or was cancelled
+            result_desc = stk_callback.get('ResultDesc', 'Payment was not completed.')
+            print(f"Payment failed for Order #{order.id}. Reason: {result_desc}")
+
+            # Put the held units back on sale
+            release_reservations(StockReservation.objects.filter(order=order))
+
+            # Notify customer of failure
+            customer_phone = order.customer.phone_number
+            failure_message = (
+                f"❌ Payment Failed\n\n"
+                f"The payment for your order #{order.id} was not completed.\n"
+                f"Reason: {result_desc}\n\n"
+                "You can restart the checkout process by typing 'cart'."
+            )
+            enqueue_whatsapp_message(customer_phone, failure_message)
+
+    return True
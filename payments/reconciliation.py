@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from orders.models import Order
+from sellers.models import SellerProfile
+from .processing import apply_stk_result
+from .services import query_stk_status, get_seller_credentials
+
+CHECKPOINT_CACHE_KEY = 'payments:reconcile:checkpoint'
+CHECKPOINT_TIMEOUT = 60 * 60 * 24
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart, across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _load_checkpoint():
+    checkpoint = cache.get(CHECKPOINT_CACHE_KEY)
+    if not checkpoint:
+        return None
+    return parse_datetime(checkpoint['updated_at']), checkpoint['id']
+
+
+def _save_checkpoint(updated_at, order_id):
+    cache.set(CHECKPOINT_CACHE_KEY, {'updated_at': updated_at.isoformat(), 'id': order_id}, timeout=CHECKPOINT_TIMEOUT)
+
+
+def reconcile_pending_payments(older_than_minutes, batch_size=50, concurrency=4, rate=5.0, query=query_stk_status):
+    """
+    Settles orders stuck in PENDING_PAYMENT because their Daraja callback never arrived.
+
+    Walks stale orders in (updated_at, id) order via the (status, updated_at) index,
+    queries their STK status on a bounded thread pool sharing one rate limit and
+    the pooled Daraja session, then applies final results through the same code
+    path as the M-Pesa callback. The position is checkpointed in the cache after
+    every batch, so an interrupted run resumes where it stopped.
+
+    Returns a dict with how many orders were checked, settled and still unresolved.
+    """
+    cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+    limiter = RateLimiter(rate)
+    stats = {'checked': 0, 'settled': 0, 'unresolved': 0}
+
+    def _query(order):
+        limiter.wait()
+        return query(order['mpesa_checkout_request_id'], credentials=order['credentials'])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            pending = Order.objects.filter(
+                status=Order.OrderStatus.PENDING_PAYMENT,
+                updated_at__lt=cutoff,
+                mpesa_checkout_request_id__isnull=False,
+            )
+            checkpoint = _load_checkpoint()
+            if checkpoint:
+                last_updated_at, last_id = checkpoint
+                pending = pending.filter(Q(updated_at__gt=last_updated_at) | Q(updated_at=last_updated_at, id__gt=last_id))
+
+            batch = list(
+                pending.order_by('updated_at', 'id')
+                .values('id', 'updated_at', 'mpesa_checkout_request_id', 'seller_id')[:batch_size]
+            )
+            if not batch:
+                # Reached the end of the backlog; the next run starts from the top again
+                cache.delete(CHECKPOINT_CACHE_KEY)
+                break
+
+            # Each push must be queried against the till it was issued on
+            sellers = SellerProfile.objects.in_bulk({order['seller_id'] for order in batch})
+            for order in batch:
+                order['credentials'] = get_seller_credentials(sellers[order['seller_id']])
+
+            # Only the Daraja queries run concurrently; results are applied one by one here
+            results = executor.map(_query, batch)
+            for order, result in zip(batch, results):
+                stats['checked'] += 1
+                if result is None:
+                    stats['unresolved'] += 1
+                    continue
+                try:
+                    settled = apply_stk_result({
+                        'CheckoutRequestID': order['mpesa_checkout_request_id'],
+                        'ResultCode': int(result['ResultCode']),
+                        'ResultDesc': result.get('ResultDesc'),
+                    })
+                except (Order.DoesNotExist, ValueError) as e:
+                    print(f"Could not reconcile Order #{order['id']}: {e}")
+                    stats['unresolved'] += 1
+                    continue
+                if settled:
+                    stats['settled'] += 1
+
+            last = batch[-1]
+            _save_checkpoint(last['updated_at'], last['id'])
+
+    return stats
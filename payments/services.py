@@ -1,47 +1,234 @@
 import requests
 import base64
+import threading
+import time
 from datetime import datetime
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Helper function to get the M-Pesa API access token
-def get_mpesa_access_token():
+# Tokens and their refresh locks are kept per till (shortcode)
+MPESA_TOKEN_CACHE_KEY = 'mpesa:access_token:{shortcode}'
+MPESA_TOKEN_LOCK_KEY = 'mpesa:access_token:{shortcode}:refresh_lock'
+# How long a worker may hold the refresh lock (and others wait for it)
+MPESA_TOKEN_LOCK_TIMEOUT = 15
+MPESA_TOKEN_WAIT_INTERVAL = 0.1
+
+# (connect, read) timeouts for every Daraja call
+MPESA_HTTP_TIMEOUT = (3.05, 15)
+
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+_seller_credentials = {}
+
+
+class MpesaCredentials:
+    """The till (shortcode) an STK push is issued against and its Daraja app keys."""
+
+    def __init__(self, shortcode, passkey, consumer_key, consumer_secret):
+        self.shortcode = shortcode
+        self.passkey = passkey
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+
+    def __repr__(self):
+        return f"<MpesaCredentials shortcode={self.shortcode}>"
+
+
+def get_default_credentials():
+    """The platform-wide till configured in settings."""
+    return MpesaCredentials(
+        shortcode=settings.MPESA_SHORTCODE,
+        passkey=settings.MPESA_PASSKEY,
+        consumer_key=settings.MPESA_CONSUMER_KEY,
+        consumer_secret=settings.MPESA_CONSUMER_SECRET,
+    )
+
+
+def get_seller_credentials(seller):
+    """
+    Returns the seller's own till if all four M-Pesa fields are set on their
+    profile, otherwise the platform till. Credentials are loaded once per
+    profile version and then served from memory.
+    """
+    cached = _seller_credentials.get(seller.pk)
+    if cached and cached[0] == seller.updated_at:
+        return cached[1]
+
+    fields = (seller.mpesa_shortcode, seller.mpesa_passkey, seller.mpesa_consumer_key, seller.mpesa_consumer_secret)
+    if all(fields):
+        credentials = MpesaCredentials(*fields)
+    else:
+        credentials = get_default_credentials()
+    _seller_credentials[seller.pk] = (seller.updated_at, credentials)
+    return credentials
+
+
+def get_mpesa_session(shortcode=None):
     """
-    Fetches the M-Pesa API access token using Basic Auth with consumer key and secret.
-    TODO: Cache this token to avoid requesting a new one for every transaction.
+    Returns the requests session used for Daraja calls on behalf of a till.
+    Each till gets its own connection pool, kept alive between calls, so one
+    busy seller can't starve the others. Connection errors are retried with
+    exponential backoff. Gateway errors (502/503/504) are also retried for
+    the OAuth and STK query calls, but never for the STK push itself: a 504
+    may mean Safaricom already accepted the push, and a retry would prompt
+    the customer twice.
     """
-    consumer_key = settings.MPESA_CONSUMER_KEY
-    consumer_secret = settings.MPESA_CONSUMER_SECRET
-    api_url = "https://sandbox.safaricom.co.ke/oauth/v1/generate?grant_type=client_credentials"
+    key = shortcode or settings.MPESA_SHORTCODE
+    session = _http_sessions.get(key)
+    if session is not None:
+        return session
+
+    with _http_sessions_lock:
+        if key in _http_sessions:
+            return _http_sessions[key]
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=0,  # Never resend a request Safaricom may already have processed
+            status=3,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            raise_on_status=False,
+        )
+        # Only failures to connect, where nothing reached Daraja
+        push_retry = Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=0.5)
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry))
+        session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry))
+        # requests picks the adapter with the longest matching prefix
+        session.mount(
+            f"{settings.MPESA_API_BASE_URL}/mpesa/stkpush/",
+            HTTPAdapter(pool_connections=1, pool_maxsize=20, max_retries=push_retry),
+        )
+        _http_sessions[key] = session
+    return session
+
+
+def _fetch_mpesa_access_token(credentials):
+    """
+    Fetches a new M-Pesa API access token using Basic Auth with consumer key and secret.
+    Returns a (token, expires_in) tuple, or (None, None) on failure.
+    """
+    api_url = f"{settings.MPESA_API_BASE_URL}/oauth/v1/generate?grant_type=client_credentials"
     
     try:
-        response = requests.get(api_url, auth=(consumer_key, consumer_secret))
+        response = get_mpesa_session(credentials.shortcode).get(
+            api_url,
+            auth=(credentials.consumer_key, credentials.consumer_secret),
+            timeout=MPESA_HTTP_TIMEOUT
+        )
         response.raise_for_status()
         json_response = response.json()
-        return json_response.get('access_token')
-    except requests.exceptions.RequestException as e:
+        return json_response.get('access_token'), int(json_response.get('expires_in', 3599))
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error getting M-Pesa access token: {e}")
+        return None, None
+
+
+def _store_mpesa_access_token(cache_key, token, expires_in):
+    """Caches the token with a soft refresh time ahead of its real expiry."""
+    now = time.time()
+    refresh_in = max(expires_in - settings.MPESA_TOKEN_REFRESH_MARGIN, expires_in // 2)
+    cache.set(cache_key, {
+        'access_token': token,
+        'refresh_at': now + refresh_in,
+        'expires_at': now + expires_in,
+    }, timeout=expires_in)
+
+
+# Helper function to get the M-Pesa API access token
+def get_mpesa_access_token(credentials=None):
+    """
+    Returns the shared M-Pesa access token for a till (the platform till by default).
+    The token is refreshed early, before Safaricom expires it. Refreshes are
+    single-flight: one caller across all workers takes a cache lock and fetches
+    a new token while everyone else keeps using the still-valid one, or waits
+    briefly if there is none yet.
+    """
+    credentials = credentials or get_default_credentials()
+    cache_key = MPESA_TOKEN_CACHE_KEY.format(shortcode=credentials.shortcode)
+    lock_key = MPESA_TOKEN_LOCK_KEY.format(shortcode=credentials.shortcode)
+    deadline = time.monotonic() + MPESA_TOKEN_LOCK_TIMEOUT
+
+    while True:
+        cached = cache.get(cache_key)
+        if cached and time.time() < cached['refresh_at']:
+            return cached['access_token']
+
+        # cache.add is atomic, so only one caller wins the right to refresh
+        if cache.add(lock_key, True, timeout=MPESA_TOKEN_LOCK_TIMEOUT):
+            try:
+                # Another worker may have refreshed between our read and taking the lock
+                cached = cache.get(cache_key)
+                if cached and time.time() < cached['refresh_at']:
+                    return cached['access_token']
+
+                token, expires_in = _fetch_mpesa_access_token(credentials)
+                if token:
+                    _store_mpesa_access_token(cache_key, token, expires_in)
+                    return token
+                # Refresh failed; keep using the old token while it is still valid
+                if cached and time.time() < cached['expires_at']:
+                    return cached['access_token']
+                return None
+            finally:
+                cache.delete(lock_key)
+
+        # Someone else is refreshing
+        if cached and time.time() < cached['expires_at']:
+            return cached['access_token']
+        if time.monotonic() >= deadline:
+            print("Timed out waiting for another worker to refresh the M-Pesa access token.")
+            return None
+        time.sleep(MPESA_TOKEN_WAIT_INTERVAL)
+
+def _stk_password(shortcode, passkey):
+    """Returns the (password, timestamp) pair Daraja expects on STK requests."""
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    password_str = f"{shortcode}{passkey}{timestamp}"
+    password = base64.b64encode(password_str.encode('utf-8')).decode('utf-8')
+    return password, timestamp
+
+
+def get_mpesa_callback_url():
+    """
+    The URL Safaricom posts STK results to. MPESA_CALLBACK_URL wins if set
+    (e.g. a tunnel or the local Daraja simulator), otherwise it is built from APP_DOMAIN.
+    """
+    if settings.MPESA_CALLBACK_URL:
+        return settings.MPESA_CALLBACK_URL
+
+    app_domain = settings.APP_DOMAIN
+    if not app_domain:
         return None
+    # Ensure the domain starts with https:// for production
+    if not app_domain.startswith('http'):
+        app_domain = f"https://{app_domain}"
+    return f"{app_domain}/api/payments/mpesa-callback/"
+
 
 # Main function to initiate the STK Push
-def initiate_stk_push(phone_number, amount, order_id):
+def initiate_stk_push(phone_number, amount, order_id, credentials=None):
     """
-    Initiates an M-Pesa STK Push request.
+    Initiates an M-Pesa STK Push request against the given till
+    (the platform till by default).
     This version dynamically builds the callback URL from environment variables.
     """
-    access_token = get_mpesa_access_token()
+    credentials = credentials or get_default_credentials()
+    access_token = get_mpesa_access_token(credentials)
     if not access_token:
         print("Failed to get M-Pesa access token. Aborting STK push.")
         return None
 
-    api_url = "https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest"
+    api_url = f"{settings.MPESA_API_BASE_URL}/mpesa/stkpush/v1/processrequest"
     headers = {"Authorization": f"Bearer {access_token}"}
     
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    shortcode = settings.MPESA_SHORTCODE
-    passkey = settings.MPESA_PASSKEY
-    
-    password_str = f"{shortcode}{passkey}{timestamp}"
-    password = base64.b64encode(password_str.encode('utf-8')).decode('utf-8')
+    shortcode = credentials.shortcode
+    password, timestamp = _stk_password(shortcode, credentials.passkey)
 
     # Format phone number
     if phone_number.startswith('+'):
@@ -51,21 +238,10 @@ def initiate_stk_push(phone_number, amount, order_id):
     else:
         formatted_phone = phone_number
 
-    # --- THIS IS THE CRUCIAL FIX ---
-    # Build the callback URL dynamically from the APP_DOMAIN env var
-    # instead of hardcoding it.
-    app_domain = settings.APP_DOMAIN
-    print(f"APP_DOMAIN: {settings.APP_DOMAIN}") # We get this from our settings file
-    if not app_domain:
-        print("ERROR: APP_DOMAIN environment variable is not set. Cannot form callback URL.")
+    callback_url = get_mpesa_callback_url()
+    if not callback_url:
+        print("ERROR: Neither MPESA_CALLBACK_URL nor APP_DOMAIN is set. Cannot form callback URL.")
         return None
-    
-    # Ensure the domain starts with https:// for production
-    if not app_domain.startswith('http'):
-         app_domain = f"https://{app_domain}"
-
-    # callback_url = f"{app_domain}/api/payments/mpesa-callback/"
-    callback_url = "https://webhook.site/f6fab547-4dc6-4b3e-87fc-5529a5630996"
     print(f"Using M-Pesa callback URL: {callback_url}")
     
     payload = {
@@ -83,10 +259,48 @@ def initiate_stk_push(phone_number, amount, order_id):
     }
 
     try:
-        response = requests.post(api_url, json=payload, headers=headers)
+        response = get_mpesa_session(shortcode).post(api_url, json=payload, headers=headers, timeout=MPESA_HTTP_TIMEOUT)
         response.raise_for_status()
         print("STK Push initiated successfully. Response:", response.json())
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"Error initiating STK push: {e.response.text if e.response else e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def query_stk_status(checkout_request_id, credentials=None):
+    """
+    Asks Daraja for the outcome of an STK push (the STK Push Query API).
+    Returns the JSON response, or None if there is no final result yet or the call failed.
+    """
+    credentials = credentials or get_default_credentials()
+    access_token = get_mpesa_access_token(credentials)
+    if not access_token:
+        print("Failed to get M-Pesa access token. Cannot query STK status.")
+        return None
+
+    api_url = f"{settings.MPESA_API_BASE_URL}/mpesa/stkpushquery/v1/query"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    shortcode = credentials.shortcode
+    password, timestamp = _stk_password(shortcode, credentials.passkey)
+    payload = {
+        "BusinessShortCode": shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id,
+    }
+
+    try:
+        response = get_mpesa_session(shortcode).post(api_url, json=payload, headers=headers, timeout=MPESA_HTTP_TIMEOUT)
+        # While the customer hasn't answered the prompt Daraja replies with an error
+        # ("The transaction is being processed"), which simply means "ask again later".
+        if response.status_code != 200:
+            return None
+        json_response = response.json()
+        if json_response.get('ResultCode') is None:
+            return None
+        return json_response
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error querying STK status for {checkout_request_id}: {e}")
+        return None
@@ -0,0 +1,204 @@
+"""
+A local stand-in for Safaricom's Daraja API, for load-testing checkout without
+the sandbox. It implements OAuth generate, STK push and STK push query, and
+POSTs the STK result to the request's CallBackURL after a configurable delay.
+
+Point MPESA_API_BASE_URL at it (e.g. http://127.0.0.1:8001) and run it with
+`manage.py run_daraja_simulator`.
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import requests
+
+# (ResultCode, ResultDesc) pairs as Daraja sends them
+RESULT_SUCCESS = (0, "The service request is processed successfully.")
+RESULT_FAILURES = [
+    (1032, "Request cancelled by user"),
+    (1, "The balance is insufficient for the transaction."),
+    (2001, "The initiator information is invalid."),
+]
+RESULT_TIMEOUT = (1037, "DS timeout user cannot be reached")
+
+
+class DarajaSimulator:
+    """
+    Holds the simulated STK pushes and decides their outcome.
+
+    Each push succeeds unless it draws a failure (`failure_rate`) or a timeout
+    (`timeout_rate`). With `drop_rate` the callback is never sent, leaving the
+    order for the reconciliation poller, which can still query the result.
+    """
+
+    def __init__(self, callback_delay=2.0, delay_jitter=1.0, failure_rate=0.0,
+                 timeout_rate=0.0, drop_rate=0.0, callback_url=None, seed=None):
+        self.callback_delay = callback_delay
+        self.delay_jitter = delay_jitter
+        self.failure_rate = failure_rate
+        self.timeout_rate = timeout_rate
+        self.drop_rate = drop_rate
+        self.callback_url = callback_url
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.pushes = {}  # CheckoutRequestID -> push state
+        self.tokens = set()
+        self.stats = {'pushes': 0, 'callbacks_sent': 0, 'callbacks_failed': 0, 'callbacks_dropped': 0, 'queries': 0}
+        self.lock = threading.Lock()
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens.add(token)
+        return token
+
+    def is_authorized(self, header):
+        scheme, _, token = (header or '').partition(' ')
+        return scheme == 'Bearer' and token in self.tokens
+
+    def _draw_outcome(self):
+        roll = self.random.random()
+        if roll < self.timeout_rate:
+            return RESULT_TIMEOUT
+        if roll < self.timeout_rate + self.failure_rate:
+            return self.random.choice(RESULT_FAILURES)
+        return RESULT_SUCCESS
+
+    def start_push(self, request_body):
+        checkout_request_id = f"ws_CO_{datetime.now():%d%m%Y%H%M%S}{uuid.uuid4().hex[:12]}"
+        merchant_request_id = f"{self.random.randint(10000, 99999)}-{self.random.randint(1000000, 9999999)}-1"
+        delay = max(0.0, self.callback_delay + self.random.uniform(-self.delay_jitter, self.delay_jitter))
+        push = {
+            'merchant_request_id': merchant_request_id,
+            'checkout_request_id': checkout_request_id,
+            'amount': request_body['Amount'],
+            'phone_number': request_body['PhoneNumber'],
+            'callback_url': self.callback_url or request_body['CallBackURL'],
+            'outcome': self._draw_outcome(),
+            'settles_at': time.monotonic() + delay,
+        }
+        with self.lock:
+            self.pushes[checkout_request_id] = push
+            self.stats['pushes'] += 1
+
+        if self.random.random() < self.drop_rate:
+            with self.lock:
+                self.stats['callbacks_dropped'] += 1
+        else:
+            timer = threading.Timer(delay, self._send_callback, args=(push,))
+            timer.daemon = True
+            timer.start()
+
+        return {
+            "MerchantRequestID": merchant_request_id,
+            "CheckoutRequestID": checkout_request_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    def _callback_body(self, push):
+        result_code, result_desc = push['outcome']
+        stk_callback = {
+            "MerchantRequestID": push['merchant_request_id'],
+            "CheckoutRequestID": push['checkout_request_id'],
+            "ResultCode": result_code,
+            "ResultDesc": result_desc,
+        }
+        if result_code == 0:
+            stk_callback["CallbackMetadata"] = {"Item": [
+                {"Name": "Amount", "Value": push['amount']},
+                {"Name": "MpesaReceiptNumber", "Value": f"SIM{uuid.uuid4().hex[:7].upper()}"},
+                {"Name": "TransactionDate", "Value": int(datetime.now().strftime('%Y%m%d%H%M%S'))},
+                {"Name": "PhoneNumber", "Value": push['phone_number']},
+            ]}
+        return {"Body": {"stkCallback": stk_callback}}
+
+    def _send_callback(self, push):
+        try:
+            response = self.session.post(push['callback_url'], json=self._callback_body(push), timeout=30)
+            response.raise_for_status()
+            key = 'callbacks_sent'
+        except requests.exceptions.RequestException as e:
+            print(f"Callback for {push['checkout_request_id']} failed: {e}")
+            key = 'callbacks_failed'
+        with self.lock:
+            self.stats[key] += 1
+
+    def query(self, checkout_request_id):
+        """Returns (status, body) for an STK push query."""
+        with self.lock:
+            self.stats['queries'] += 1
+            push = self.pushes.get(checkout_request_id)
+        if push is None:
+            return 500, {"errorCode": "500.001.1001", "errorMessage": "The transaction is not found"}
+        if time.monotonic() < push['settles_at']:
+            return 500, {"errorCode": "500.001.1001", "errorMessage": "The transaction is being processed"}
+        result_code, result_desc = push['outcome']
+        return 200, {
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successsfully",
+            "MerchantRequestID": push['merchant_request_id'],
+            "CheckoutRequestID": checkout_request_id,
+            "ResultCode": str(result_code),
+            "ResultDesc": result_desc,
+        }
+
+
+class DarajaRequestHandler(BaseHTTPRequestHandler):
+    simulator = None  # set on the subclass built by make_server()
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/oauth/v1/generate':
+            return self._reply(404, {"errorMessage": "Resource not found"})
+        if not (self.headers.get('Authorization') or '').startswith('Basic '):
+            return self._reply(400, {"errorCode": "400.008.01", "errorMessage": "Invalid Authentication passed"})
+        self._reply(200, {"access_token": self.simulator.issue_token(), "expires_in": "3599"})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path not in ('/mpesa/stkpush/v1/processrequest', '/mpesa/stkpushquery/v1/query'):
+            return self._reply(404, {"errorMessage": "Resource not found"})
+        if not self.simulator.is_authorized(self.headers.get('Authorization')):
+            return self._reply(401, {"errorCode": "404.001.03", "errorMessage": "Invalid Access Token"})
+
+        body = self._read_json()
+        if path == '/mpesa/stkpush/v1/processrequest':
+            required = ('BusinessShortCode', 'Password', 'Timestamp', 'Amount', 'PhoneNumber', 'CallBackURL')
+            missing = [field for field in required if not (body or {}).get(field)]
+            if missing:
+                return self._reply(400, {"errorCode": "400.002.02", "errorMessage": f"Bad Request - Invalid {missing[0]}"})
+            return self._reply(200, self.simulator.start_push(body))
+
+        if not (body or {}).get('CheckoutRequestID'):
+            return self._reply(400, {"errorCode": "400.002.02", "errorMessage": "Bad Request - Invalid CheckoutRequestID"})
+        self._reply(*self.simulator.query(body['CheckoutRequestID']))
+
+    def log_message(self, format, *args):
+        # Keep the console readable under load
+        pass
+
+
+def make_server(simulator, host='127.0.0.1', port=8001):
+    handler = type('BoundDarajaRequestHandler', (DarajaRequestHandler,), {'simulator': simulator})
+    return ThreadingHTTPServer((host, port), handler)
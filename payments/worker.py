@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core_backend.versions import bump_seller_version
+from orders.models import Order
+from products.inventory import release_reservations
+from products.models import StockReservation
+from whatsapp_comms.outbox import enqueue_whatsapp_message
+from .models import PaymentEvent
+from .services import initiate_stk_push, get_seller_credentials
+
+PUSH_FAILED_MESSAGE = "We couldn't initiate the payment request at this time. Please try again shortly by typing 'checkout'."
+
+
+def _claim_next_payment_request():
+    """
+    Moves the oldest PAYMENT_REQUESTED order to PAYMENT_SENDING and returns
+    it, or None. The claim commits straight away, so no row lock or
+    transaction is held while the push is in flight.
+    """
+    with transaction.atomic():
+        order = (
+            Order.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('customer', 'seller')
+            .filter(status=Order.OrderStatus.PAYMENT_REQUESTED)
+            .order_by('updated_at')
+            .first()
+        )
+        if order is not None:
+            order.status = Order.OrderStatus.PAYMENT_SENDING
+            order.save(update_fields=['status', 'updated_at'])
+    return order
+
+
+def _fail_payment_request(order):
+    """
+    Gives the customer their cart back so they can retry with 'checkout',
+    unless they have already started a new one. Returns False if the order
+    had already left PAYMENT_SENDING.
+    """
+    with transaction.atomic():
+        has_other_cart = Order.objects.filter(
+            customer_id=order.customer_id,
+            seller_id=order.seller_id,
+            status=Order.OrderStatus.IN_PROGRESS
+        ).exists()
+        new_status = Order.OrderStatus.FAILED if has_other_cart else Order.OrderStatus.IN_PROGRESS
+        claimed = Order.objects.filter(pk=order.pk, status=Order.OrderStatus.PAYMENT_SENDING).update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if not claimed:
+            return False
+        order.status = new_status
+        # update() sends no signals
+        bump_seller_version('orders', order.seller_id)
+        release_reservations(StockReservation.objects.filter(order=order))
+        enqueue_whatsapp_message(order.customer.phone_number, PUSH_FAILED_MESSAGE)
+    print(f"STK push failed for Order #{order.id}. Order moved back to {order.status}.")
+    return True
+
+
+def process_next_payment_request():
+    """
+    Claims one order the bot marked PAYMENT_REQUESTED and sends its STK push.
+    Returns False when there was nothing waiting.
+
+    Rows are claimed with SKIP LOCKED and moved to PAYMENT_SENDING before the
+    push, so several workers can run side by side without ever pushing the
+    same order twice.
+    """
+    order = _claim_next_payment_request()
+    if order is None:
+        return False
+
+    response = initiate_stk_push(
+        phone_number=order.customer.phone_number,
+        amount=order.total_amount,
+        order_id=order.id,
+        # Money goes to the seller's own till when they have configured one
+        credentials=get_seller_credentials(order.seller)
+    )
+
+    if response and response.get('ResponseCode') == '0':
+        checkout_request_id = response.get('CheckoutRequestID')
+        with transaction.atomic():
+            claimed = Order.objects.filter(pk=order.pk, status=Order.OrderStatus.PAYMENT_SENDING).update(
+                status=Order.OrderStatus.PENDING_PAYMENT,
+                mpesa_checkout_request_id=checkout_request_id,
+                updated_at=timezone.now(),
+            )
+            if not claimed:
+                # The stale sweep failed the order while the push was in flight.
+                # Keep the checkout id so the customer's payment, if they make
+                # it, is still matched and recorded for a refund.
+                Order.objects.filter(pk=order.pk).update(
+                    mpesa_checkout_request_id=checkout_request_id, updated_at=timezone.now()
+                )
+            order.mpesa_checkout_request_id = checkout_request_id
+            bump_seller_version('orders', order.seller_id)
+            PaymentEvent.record(
+                order=order,
+                event_type=PaymentEvent.EventType.REQUESTED,
+                checkout_request_id=checkout_request_id,
+                amount=order.total_amount,
+                payload=response,
+            )
+        if claimed:
+            print(f"STK push sent for Order #{order.id}.")
+        else:
+            print(
+                f"WARNING: STK push {checkout_request_id} for Order #{order.id} was accepted after the order "
+                f"was failed as stale. A payment against it will need a refund."
+            )
+        return True
+
+    _fail_payment_request(order)
+    return True
+
+
+def fail_stale_payment_claims():
+    """
+    Fails orders left in PAYMENT_SENDING for PAYMENT_CLAIM_TIMEOUT_SECONDS by
+    a worker that died mid-push. Whether that push reached Safaricom is
+    unknown, so the customer is asked to check out again instead of being
+    prompted a second time. Returns how many orders were failed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PAYMENT_CLAIM_TIMEOUT_SECONDS)
+    stale = (
+        Order.objects.select_related('customer')
+        .filter(status=Order.OrderStatus.PAYMENT_SENDING, updated_at__lt=cutoff)
+        .order_by('updated_at')
+    )
+    failed = 0
+    for order in stale:
+        print(f"Order #{order.id} was claimed for an STK push at {order.updated_at} and never finished.")
+        failed += _fail_payment_request(order)
+    return failed
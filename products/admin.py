@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, StockReservation
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'seller', 'sku', 'price', 'inventory_count', 'is_active')
+    list_display = ('name', 'seller', 'sku', 'price', 'inventory_count', 'reserved_count', 'is_active')
     list_filter = ('is_active', 'seller')
     search_fields = ('name', 'sku', 'seller__user__username')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'expires_at')
+    list_filter = ('expires_at',)
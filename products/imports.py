@@ -0,0 +1,143 @@
+"""
+Bulk product import: a CSV file or a JSON array of products, upserted on
+(seller, sku).
+
+Rows are validated in memory against one serializer, SKUs are checked
+against the rest of the import and one pre-fetched set of the seller's
+SKUs, and the valid rows are written with INSERT ... ON CONFLICT DO UPDATE
+in PRODUCT_IMPORT_BATCH_SIZE batches. Invalid rows are reported by position
+and don't stop the rest.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import BaseParser
+
+from core_backend.versions import bump_seller_version
+from .models import Product
+from .serializers import ProductImportSerializer
+
+IMPORT_FIELDS = ProductImportSerializer.Meta.fields
+# List columns in a CSV hold a JSON array or "|"-separated values
+LIST_FIELDS = ('sizes', 'images')
+
+
+def read_csv(text):
+    """Product dicts from CSV text with a header row; empty cells are left out."""
+    rows = []
+    for record in csv.DictReader(io.StringIO(text.lstrip('\ufeff'))):
+        row = {}
+        for column, value in record.items():
+            if column is None or value is None:
+                continue
+            column, value = column.strip(), value.strip()
+            if not value:
+                continue
+            if column in LIST_FIELDS:
+                if value.startswith('['):
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass  # left as text for the serializer to reject
+                else:
+                    value = [part.strip() for part in value.split('|') if part.strip()]
+            row[column] = value
+        rows.append(row)
+    return rows
+
+
+class CSVParser(BaseParser):
+    """Parses a text/csv request body into a list of product dicts."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return read_csv(stream.read().decode(encoding))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f"CSV parse error - {exc}")
+
+
+def import_rows(request):
+    """
+    The rows of an import request: a JSON array, a text/csv body, or a CSV
+    uploaded as the `file` field of a multipart form.
+    """
+    if isinstance(request.data, list):
+        rows = request.data
+    elif 'file' in request.FILES:
+        try:
+            rows = read_csv(request.FILES['file'].read().decode('utf-8'))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError(f"CSV parse error - {exc}")
+    else:
+        raise ValidationError("Send a JSON array of products, a text/csv body or a CSV file upload named 'file'.")
+
+    if not rows:
+        raise ValidationError("The import has no rows.")
+    if len(rows) > settings.PRODUCT_IMPORT_MAX_ROWS:
+        raise ValidationError(f"An import can have at most {settings.PRODUCT_IMPORT_MAX_ROWS} rows.")
+    return rows
+
+
+def import_products(seller, rows):
+    """
+    Creates or updates the seller's products from `rows` (dicts keyed by
+    IMPORT_FIELDS), matching existing products on SKU. An existing product
+    only has the columns its own row provides overwritten (a missing key or
+    blank CSV cell leaves the stored value alone), except that an imported
+    product is made active unless its row says otherwise.
+
+    Returns (created count, updated count, [{"row": n, "sku": ..., "errors": {...}}])
+    with rows numbered from 1, not counting a CSV header.
+    """
+    serializer = ProductImportSerializer()
+    errors = []
+    # Valid products grouped by the columns their rows provide, so each
+    # upsert only overwrites what its rows actually carry
+    groups = {}
+    first_row_by_sku = {}
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': number, 'sku': None, 'errors': {'non_field_errors': ["Expected an object."]}})
+            continue
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as exc:
+            errors.append({'row': number, 'sku': row.get('sku'), 'errors': exc.detail})
+            continue
+        # A second row for a SKU would hit the same row twice in one upsert
+        first = first_row_by_sku.setdefault(data['sku'], number)
+        if first != number:
+            errors.append({
+                'row': number, 'sku': data['sku'],
+                'errors': {'sku': [f"Duplicate of row {first} in this import."]},
+            })
+            continue
+        columns = tuple(field for field in IMPORT_FIELDS if field in data and field not in ('sku', 'is_active'))
+        groups.setdefault(columns, []).append(Product(seller=seller, **data))
+
+    if not groups:
+        return 0, 0, errors
+
+    total = updated = 0
+    with transaction.atomic():
+        existing = set(Product.objects.filter(seller=seller).values_list('sku', flat=True))
+        for columns, products in groups.items():
+            total += len(products)
+            updated += sum(1 for product in products if product.sku in existing)
+            Product.objects.bulk_create(
+                products,
+                batch_size=settings.PRODUCT_IMPORT_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['seller', 'sku'],
+                update_fields=[*columns, 'is_active', 'updated_at', 'catalog_updated_at'],
+            )
+        # bulk_create() sends no signals
+        bump_seller_version('products', seller.pk)
+
+    return total - updated, updated, errors
@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core_backend.versions import bump_seller_version
+from .models import Product, StockReservation
+
+
+def _update_by_quantity(quantities, assignments, condition=None):
+    """
+    Runs one UPDATE over all products in `quantities` (product id -> quantity)
+    and returns the ids of the rows it changed (bumping their sellers' product
+    versions). `{qty}` in the SQL fragments
+    stands for each row's own quantity, e.g. "inventory_count >= {qty}".
+    """
+    table = connection.ops.quote_name(Product._meta.db_table)
+    case_sql = 'CASE id ' + ' '.join('WHEN %s THEN %s' for _ in quantities) + ' END'
+    case_params = [value for item in quantities.items() for value in item]
+    id_placeholders = ', '.join('%s' for _ in quantities)
+
+    def expand(fragment):
+        return fragment.replace('{qty}', f'({case_sql})'), case_params * fragment.count('{qty}')
+
+    set_sql, set_params = expand(assignments)
+    sql = f"UPDATE {table} SET {set_sql}, updated_at = %s WHERE id IN ({id_placeholders})"
+    params = set_params + [timezone.now()] + list(quantities)
+    if condition:
+        condition_sql, condition_params = expand(condition)
+        sql += f" AND {condition_sql}"
+        params += condition_params
+    sql += " RETURNING id, seller_id"
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    bump_seller_version('products', *{seller_id for _, seller_id in rows})
+    return {product_id for product_id, _ in rows}
+
+
+def _clean(quantities):
+    return {product_id: qty for product_id, qty in quantities.items() if product_id and qty}
+
+
+def decrement_inventory(quantities):
+    """
+    Commits sold quantities with a single conditional UPDATE:
+
+        UPDATE ... SET inventory_count = inventory_count - qty
+        WHERE id IN (...) AND inventory_count >= qty
+
+    `quantities` maps product id -> quantity to take. Products without enough
+    stock are left untouched; their ids are returned so the caller can flag them.
+    """
+    quantities = _clean(quantities)
+    if not quantities:
+        return set()
+    filled = _update_by_quantity(
+        quantities,
+        'inventory_count = inventory_count - {qty}',
+        'inventory_count >= {qty}',
+    )
+    return set(quantities) - filled
+
+
+class _ReservationFailed(Exception):
+    pass
+
+
+def reserve_stock(order, quantities, ttl=None):
+    """
+    Holds `quantities` (product id -> quantity) for an order, all or nothing.
+    Availability is checked and reserved_count bumped in one conditional UPDATE,
+    so no row lock outlives the statement. Any earlier holds for the order are
+    released first, making a repeated checkout safe.
+
+    Returns the set of product ids that didn't have enough free stock
+    (empty when everything was reserved).
+    """
+    quantities = _clean(quantities)
+    ttl = ttl if ttl is not None else settings.STOCK_RESERVATION_TTL_SECONDS
+
+    with transaction.atomic():
+        release_reservations(StockReservation.objects.filter(order=order))
+        if not quantities:
+            return set()
+        try:
+            with transaction.atomic():
+                reserved = _update_by_quantity(
+                    quantities,
+                    'reserved_count = reserved_count + {qty}',
+                    'inventory_count - reserved_count >= {qty}',
+                )
+                if len(reserved) != len(quantities):
+                    # Roll back the partial reservation
+                    raise _ReservationFailed()
+        except _ReservationFailed:
+            return set(quantities) - reserved
+
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        StockReservation.objects.bulk_create([
+            StockReservation(order=order, product_id=product_id, quantity=qty, expires_at=expires_at)
+            for product_id, qty in quantities.items()
+        ])
+    return set()
+
+
+def _held_quantities(reservations):
+    held = defaultdict(int)
+    for product_id, qty in reservations.values_list('product_id', 'quantity'):
+        held[product_id] += qty
+    return held
+
+
+def release_reservations(reservations):
+    """Gives the held units back in one UPDATE and deletes the holds. Returns units released."""
+    with transaction.atomic():
+        held = _held_quantities(reservations.select_for_update())
+        if not held:
+            return 0
+        _update_by_quantity(held, 'reserved_count = reserved_count - {qty}')
+        reservations.delete()
+    return sum(held.values())
+
+
+def commit_reservations(order, quantities):
+    """
+    Turns an order's holds into sold stock once it is paid. Held units move out
+    of both inventory_count and reserved_count; anything not (or no longer) held,
+    e.g. because the hold expired, falls back to decrement_inventory.
+
+    Returns the set of product ids that could not be filled.
+    """
+    quantities = _clean(quantities)
+    with transaction.atomic():
+        reservations = StockReservation.objects.filter(order=order)
+        held = _held_quantities(reservations.select_for_update())
+        unfilled = set()
+        if held:
+            committed = _update_by_quantity(
+                held,
+                'inventory_count = inventory_count - {qty}, reserved_count = reserved_count - {qty}',
+                'inventory_count >= {qty}',
+            )
+            unfilled_held = set(held) - committed
+            if unfilled_held:
+                # The seller lowered stock below what was held; just drop those holds
+                _update_by_quantity({pid: held[pid] for pid in unfilled_held}, 'reserved_count = reserved_count - {qty}')
+                unfilled |= unfilled_held
+            reservations.delete()
+
+        remaining = {
+            product_id: qty - held.get(product_id, 0)
+            for product_id, qty in quantities.items()
+            if qty > held.get(product_id, 0)
+        }
+        unfilled |= decrement_inventory(remaining)
+    return unfilled
+
+
+def release_expired_reservations(batch_size=1000):
+    """Releases holds past their expiry, a batch at a time. Returns units released."""
+    released = 0
+    while True:
+        expired_ids = list(
+            StockReservation.objects.filter(expires_at__lte=timezone.now())
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not expired_ids:
+            return released
+        released += release_reservations(StockReservation.objects.filter(id__in=expired_ids))
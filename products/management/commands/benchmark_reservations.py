@@ -0,0 +1,98 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+
+from orders.models import Order
+from products.inventory import reserve_stock, release_reservations
+from products.models import Product, StockReservation
+from sellers.models import SellerProfile
+from whatsapp_comms.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent checkouts against a few hot products, reporting reservation "
+        "throughput and latency. Creates a throwaway seller and removes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5)
+        parser.add_argument('--stock', type=int, default=1000, help="Units per product.")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--checkouts', type=int, default=200, help="Checkouts per thread.")
+        parser.add_argument('--max-quantity', type=int, default=3)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            username=f"bench-{uuid.uuid4().hex[:12]}", password=uuid.uuid4().hex
+        )
+        # The profile is created by the post_save signal on User
+        seller = SellerProfile.objects.get(user=user)
+        try:
+            self._run(seller, options)
+        finally:
+            Order.objects.filter(seller=seller).delete()
+            Product.objects.filter(seller=seller).delete()
+            Customer.objects.filter(phone_number__startswith='bench-').delete()
+            user.delete()
+
+    def _run(self, seller, options):
+        product_ids = [
+            Product.objects.create(
+                seller=seller, name=f"Bench product {i}", price=1, inventory_count=options['stock']
+            ).id
+            for i in range(options['products'])
+        ]
+        latencies = []
+        counts = {'reserved': 0, 'rejected': 0}
+        lock = threading.Lock()
+
+        def worker(index):
+            customer = Customer.objects.create(phone_number=f"bench-{uuid.uuid4().hex[:10]}")
+            rng = random.Random(index)
+            try:
+                for _ in range(options['checkouts']):
+                    order = Order.objects.create(customer=customer, seller=seller)
+                    quantities = {
+                        product_id: rng.randint(1, options['max_quantity'])
+                        for product_id in rng.sample(product_ids, k=min(2, len(product_ids)))
+                    }
+                    started = time.perf_counter()
+                    unavailable = reserve_stock(order, quantities)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        counts['rejected' if unavailable else 'reserved'] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+
+        oversold = Product.objects.filter(id__in=product_ids, reserved_count__gt=F('inventory_count')).count()
+        latencies.sort()
+        self.stdout.write(
+            f"{len(latencies)} checkouts in {wall:.2f}s ({len(latencies) / wall:.0f}/s): "
+            f"{counts['reserved']} reserved, {counts['rejected']} rejected for stock"
+        )
+        self.stdout.write(
+            f"latency p50={statistics.median(latencies) * 1000:.1f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms "
+            f"max={latencies[-1] * 1000:.1f}ms"
+        )
+        self.stdout.write(f"products oversold: {oversold}")
+
+        released = release_reservations(StockReservation.objects.filter(product_id__in=product_ids))
+        self.stdout.write(f"released {released} held unit(s)")
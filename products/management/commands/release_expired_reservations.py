@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Releases checkout stock holds whose payment window has expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=30, help="Seconds between sweeps.")
+        parser.add_argument('--once', action='store_true', help="Sweep once and exit.")
+
+    def handle(self, *args, **options):
+        while True:
+            released = release_expired_reservations(options['batch_size'])
+            if released:
+                self.stdout.write(f"Released {released} held unit(s).")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='catalog_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,7 +1,15 @@
 # retail_saas/products/models.py
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from core_backend.versions import bump_seller_version
 from sellers.models import SellerProfile # Import the SellerProfile model
 
+# The fields the WhatsApp order parser matches messages against
+CATALOG_FIELDS = ('name', 'sku', 'sizes', 'is_active')
+
+
 class Product(models.Model):
     # This is the crucial link for multi-tenancy.
     # Each product belongs to one seller. A seller can have many products.
@@ -20,12 +28,17 @@ class Product(models.Model):
     images = models.JSONField(default=list, blank=True) # e.g., ["http://.../img1.png", "http://.../img2.png"]
     
     inventory_count = models.PositiveIntegerField(default=0)
+    # Units held for checkouts that haven't been paid yet (see StockReservation)
+    reserved_count = models.PositiveIntegerField(default=0)
     
     # We'll use is_active for soft deletes instead of actually deleting the record.
     is_active = models.BooleanField(default=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Only moves when a CATALOG_FIELDS value changes, unlike updated_at, which
+    # every stock movement bumps
+    catalog_updated_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         # Enforce that the SKU must be unique for each seller.
@@ -34,4 +47,46 @@ class Product(models.Model):
         ordering = ['-created_at'] # Default ordering for product queries
 
     def __str__(self):
-        return f"{self.name} ({self.seller.user.username})"
\ No newline at end of file
+        return f"{self.name} ({self.seller.user.username})"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in CATALOG_FIELDS):
+            instance._loaded_catalog = instance.catalog_values()
+        return instance
+
+    def catalog_values(self):
+        return tuple(getattr(self, field) for field in CATALOG_FIELDS)
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_catalog', None)
+        if loaded is None or loaded != self.catalog_values():
+            self.catalog_updated_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'catalog_updated_at'}
+        super().save(*args, **kwargs)
+        self._loaded_catalog = self.catalog_values()
+
+
+class StockReservation(models.Model):
+    """
+    A time-limited hold on product units, placed when checkout starts.
+    The held units are counted in Product.reserved_count until the hold is
+    committed on payment or released (payment failure or expiry).
+    """
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} held for Order {self.order_id} until {self.expires_at:%H:%M}"
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_products_version(sender, instance, **kwargs):
+    # Invalidates the seller's cached product list (see core_backend.versions)
+    bump_seller_version('products', instance.seller_id)
@@ -20,12 +20,13 @@ class ProductSerializer(serializers.ModelSerializer):
             'sizes',
             'images',
             'inventory_count',
+            'reserved_count',
             'is_active',
             'created_at',
             'updated_at',
             # 'seller_username',
         ]
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'reserved_count', 'created_at', 'updated_at')
 
     def validate_sku(self, value):
         """
@@ -44,4 +45,17 @@ class ProductSerializer(serializers.ModelSerializer):
             if Product.objects.filter(seller=seller_profile, sku=value).exclude(pk=self.instance.pk).exists():
                 raise serializers.ValidationError("A product with this SKU already exists.")
         
-        return value
\ No newline at end of file
+        return value
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk import. SKUs are checked against the whole import
+    and the seller's catalog in products.imports, not one query per row.
+    """
+
+    class Meta:
+        model = Product
+        fields = ['name', 'description', 'sku', 'price', 'sizes', 'images', 'inventory_count', 'is_active']
+        # The SKU is what an import matches existing products on
+        extra_kwargs = {'sku': {'required': True, 'allow_null': False, 'allow_blank': False}}
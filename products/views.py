@@ -1,14 +1,25 @@
 # retail_saas/products/views.py
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from rest_framework.response import Response
+
+from core_backend.mixins import SparseFieldsMixin
+from core_backend.versions import ConditionalGetMixin
+from .imports import CSVParser, import_products, import_rows
 from .models import Product
 from .serializers import ProductSerializer
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows retailers to view and manage their products.
+    Supports `?fields=` and a `?view=summary` list without descriptions,
+    images or sizes. Reads answer 304 while the seller's products are unchanged.
     """
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated] # Only authenticated users can manage products
+    summary_fields = ('id', 'name', 'sku', 'price', 'inventory_count', 'reserved_count', 'is_active')
+    version_resources = ('products',)
 
     def get_queryset(self):
         """
@@ -39,4 +50,17 @@ class ProductViewSet(viewsets.ModelViewSet):
         Mark the product as inactive instead of deleting it.
         """
         instance.is_active = False
-        instance.save()
\ No newline at end of file
+        instance.save()
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[JSONParser, CSVParser, MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Creates or updates many products at once, matched on SKU: a JSON array,
+        a text/csv body or a CSV upload named `file`. Valid rows are saved;
+        the rest are reported by row number.
+        """
+        rows = import_rows(request)
+        created, updated, errors = import_products(request.user.seller_profile, rows)
+        print(f"Product import for seller {request.user.pk}: {created} created, {updated} updated, {len(errors)} rejected")
+        response_status = status.HTTP_400_BAD_REQUEST if errors and not (created or updated) else status.HTTP_200_OK
+        return Response({'created': created, 'updated': updated, 'errors': errors}, status=response_status)
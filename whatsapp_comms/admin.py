@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Conversation, Message
+from .models import Customer, Conversation, Message, OutboxEvent
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -16,3 +16,9 @@ class ConversationAdmin(admin.ModelAdmin):
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('conversation', 'sender', 'timestamp')
     list_filter = ('sender',)
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'recipient', 'attempts', 'created_at', 'published_at')
+    list_filter = ('kind',)
+    search_fields = ('recipient',)
@@ -1,16 +1,118 @@
+import asyncio
 import json
 import logging
+import time
+import weakref
+from collections import OrderedDict, deque
+from urllib.parse import parse_qs
+
+import msgpack
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from sellers.models import SellerProfile
+from .inbox_stream import events_since, latest_seq
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Close code telling the dashboard it fell too far behind; it reconnects with
+# its last seq and catches up from the event stream
+CLOSE_CODE_LAGGING = 4008
+
+# Live consumers in this process and totals for closed ones, for the metrics endpoint
+_live_consumers = weakref.WeakSet()
+_closed_totals = {'events': 0, 'frames': 0, 'bytes': 0, 'coalesced': 0}
+_lag_disconnects = 0
+
+
+def inbox_socket_metrics():
+    """Queue depth, lag and throughput of the inbox sockets served by this process."""
+    now = time.monotonic()
+    consumers = [consumer for consumer in _live_consumers if consumer.room_group_name]
+    depths = [len(consumer.send_queue) for consumer in consumers]
+    unacked = [len(consumer.unacked) for consumer in consumers]
+    lags = [consumer.lag(now) for consumer in consumers]
+    totals = dict(_closed_totals)
+    for consumer in consumers:
+        for key in totals:
+            totals[key] += consumer.stats[key]
+    return {
+        'connections': len(consumers),
+        'queue_depth': {'total': sum(depths), 'max': max(depths, default=0)},
+        'unacked_frames': {'total': sum(unacked), 'max': max(unacked, default=0)},
+        'lag_seconds': {'max': round(max(lags, default=0.0), 3)},
+        'lag_disconnects': _lag_disconnects,
+        **totals,
+    }
+
+def event_frame(event):
+    """The frame a group event is sent to the client as, live or replayed (None for unknown types)."""
+    event_type = event.get('type')
+    if event_type == 'new_order_notification':
+        return {'type': 'new_order', 'payload': event.get('order', {}), 'seq': event.get('seq')}
+    if event_type == 'order_status_update':
+        return {'type': 'order_status_update', 'payload': event.get('order', {}), 'seq': event.get('seq')}
+    if event_type == 'custom_message':
+        return {'type': event.get('message_type', 'custom'), 'message': event.get('message', ''), 'seq': event.get('seq')}
+    if event_type == 'conversation_updated':
+        return {'type': 'conversation_updated', 'payload': event.get('conversation', {}), 'seq': event.get('seq')}
+    return None
+
+
 class InboxConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes a seller's inbox events to their dashboard.
+
+    Handlers never write to the socket themselves: they put frames on a bounded
+    per-connection queue that a writer task drains, so a slow dashboard can't
+    stall the channel layer. Events arriving within INBOX_COALESCE_WINDOW_MS
+    (or while the previous frame is still being written) go out as one
+    `batch` frame, and a newer status update for the same order replaces the
+    queued one. Conversation list rows are throttled to one per conversation
+    every INBOX_CONVERSATION_UPDATE_INTERVAL_MS; a row held back in between is
+    replaced by newer versions and sent when the interval is up.
+
+    daphne's send() never blocks, so the queue alone can't see a client on a
+    slow link. Clients that connect with `?acks=1` report how many frames
+    they have received (`{"type": "ack", "frames": n}`); the writer stops
+    once INBOX_MAX_UNACKED_FRAMES are in flight, leaving new events to pile
+    up in the queue, and lag counts from the oldest unacknowledged frame. A
+    client whose queue overflows or lags more than INBOX_MAX_LAG_SECONDS is
+    closed with CLOSE_CODE_LAGGING.
+
+    Missed events replayed on reconnect bypass the queue: they are sent
+    directly in INBOX_REPLAY_BATCH_SIZE batches, and a gap longer than the
+    queue bound gets `resync_required` instead.
+
+    Clients can ask for msgpack binary frames with `?encoding=msgpack`
+    instead of JSON text.
+    """
+
     async def connect(self):
         self.user = self.scope.get('user')
         self.room_group_name = None
+
+        query_params = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        self.use_msgpack = query_params.get('encoding', [''])[0] == 'msgpack'
+        self.use_acks = query_params.get('acks', [''])[0] == '1'
+        self.coalesce_window = settings.INBOX_COALESCE_WINDOW_MS / 1000
+        # coalesce key -> (monotonic time first queued, frame)
+        self.send_queue = OrderedDict()
+        self.queue_counter = 0
+        self.queue_ready = asyncio.Event()
+        self.writer_task = None
+        self.lagging = False
+        self.unacked = deque()  # monotonic send time of each frame the client hasn't acked
+        self.acked_frames = 0
+        self.ack_window = asyncio.Event()
+        self.ack_window.set()
+        self.stats = {'events': 0, 'frames': 0, 'bytes': 0, 'coalesced': 0}
+        self.row_interval = settings.INBOX_CONVERSATION_UPDATE_INTERVAL_MS / 1000
+        self.row_sent_at = {}  # conversation id -> monotonic time its last row was queued
+        self.held_rows = {}  # conversation id -> newest row frame waiting for its interval
+        self.row_timers = {}  # conversation id -> task that queues the held row
+        _live_consumers.add(self)
         
         logger.info(f"WebSocket connection attempt from user: {self.user}")
         
@@ -27,8 +129,10 @@ class InboxConsumer(AsyncWebsocketConsumer):
             return
 
         try:
-            # Get the seller profile PK
-            seller_profile_pk = await self.get_profile_pk()
+            # Get the seller profile PK, straight from the token claim when present
+            seller_profile_pk = getattr(self.user, 'seller_id', None)
+            if seller_profile_pk is None:
+                seller_profile_pk = await self.get_profile_pk()
 
             if seller_profile_pk is None:
                 logger.warning(f"User {self.user.username} has no seller profile. Closing WebSocket.")
@@ -47,22 +151,146 @@ class InboxConsumer(AsyncWebsocketConsumer):
 
             await self.accept()
             logger.info(f"WebSocket connection accepted for user {self.user.username}")
+            self.writer_task = asyncio.ensure_future(self.write_frames())
             
-            # Send a welcome message
-            await self.send(text_data=json.dumps({
+            # Send a welcome message with the current stream position
+            current_seq = await latest_seq(self.room_group_name)
+            await self.send_frame({
                 'type': 'connection_established',
-                'message': 'Successfully connected to inbox'
-            }))
+                'message': 'Successfully connected to inbox',
+                'seq': current_seq,
+                'encoding': 'msgpack' if self.use_msgpack else 'json',
+            })
+
+            # A reconnecting client tells us the last event it saw; replay only
+            # what it missed. We joined the group first, so nothing falls in
+            # between (the client drops duplicates by seq).
+            last_seq = query_params.get('last_seq', [None])[0]
+            if last_seq and last_seq != current_seq:
+                await self.replay_missed_events(last_seq, current_seq)
 
         except Exception as e:
             logger.error(f"Error during WebSocket connection: {str(e)}")
             await self.close()
 
+    async def replay_missed_events(self, last_seq, current_seq):
+        events = await events_since(self.room_group_name, last_seq)
+        if events is None or len(events) > settings.INBOX_SEND_QUEUE_SIZE:
+            gap = 'gone' if events is None else f'{len(events)} events behind'
+            logger.info(f"Events after {last_seq} for {self.room_group_name}: {gap}; asking for a resync")
+            await self.send_frame({'type': 'resync_required', 'seq': current_seq})
+            return
+        logger.info(f"Replaying {len(events)} missed event(s) to {self.user.username}")
+        # Sent straight to the socket: the handlers' queue would fill up
+        # before the writer task got a chance to drain it
+        frames = [frame for frame in map(event_frame, events) if frame is not None]
+        self.stats['events'] += len(frames)
+        size = settings.INBOX_REPLAY_BATCH_SIZE
+        for start in range(0, len(frames), size):
+            chunk = frames[start:start + size]
+            if len(chunk) == 1:
+                await self.send_frame(chunk[0])
+            else:
+                await self.send_frame({'type': 'batch', 'events': chunk, 'seq': chunk[-1].get('seq')})
+
+    async def send_frame(self, frame):
+        """Encodes one frame in the client's negotiated encoding and sends it."""
+        if self.use_msgpack:
+            data = msgpack.packb(frame)
+            await self.send(bytes_data=data)
+        else:
+            data = json.dumps(frame, separators=(',', ':'))
+            await self.send(text_data=data)
+        self.stats['frames'] += 1
+        self.stats['bytes'] += len(data)
+        if self.use_acks:
+            self.unacked.append(time.monotonic())
+            if len(self.unacked) >= settings.INBOX_MAX_UNACKED_FRAMES:
+                self.ack_window.clear()
+
+    def lag(self, now=None):
+        """Seconds the oldest queued or unacknowledged frame has been waiting."""
+        oldest = []
+        if self.send_queue:
+            oldest.append(next(iter(self.send_queue.values()))[0])
+        if self.unacked:
+            oldest.append(self.unacked[0])
+        if not oldest:
+            return 0.0
+        return (now or time.monotonic()) - min(oldest)
+
+    def handle_ack(self, frames):
+        """The client has received `frames` frames since it connected."""
+        for _ in range(min(frames - self.acked_frames, len(self.unacked))):
+            self.unacked.popleft()
+        self.acked_frames = max(self.acked_frames, frames)
+        if len(self.unacked) < settings.INBOX_MAX_UNACKED_FRAMES:
+            self.ack_window.set()
+
+    async def queue_frame(self, frame, coalesce_key=None):
+        """
+        Puts an event frame on the send queue. Frames sharing a coalesce_key
+        replace each other (the latest moves to the end to keep seq order, but
+        keeps the original queue time so lag isn't hidden).
+        """
+        if self.lagging:
+            return
+        self.stats['events'] += 1
+        queued_at = time.monotonic()
+        if coalesce_key is None:
+            self.queue_counter += 1
+            coalesce_key = self.queue_counter
+        elif coalesce_key in self.send_queue:
+            queued_at, _ = self.send_queue.pop(coalesce_key)
+            self.stats['coalesced'] += 1
+
+        if len(self.send_queue) >= settings.INBOX_SEND_QUEUE_SIZE:
+            await self.close_lagging(f"send queue full ({len(self.send_queue)} frames)")
+            return
+        lag = self.lag()
+        if lag > settings.INBOX_MAX_LAG_SECONDS:
+            await self.close_lagging(f"{lag:.1f}s behind")
+            return
+
+        self.send_queue[coalesce_key] = (queued_at, frame)
+        self.queue_ready.set()
+
+    async def write_frames(self):
+        """Writer task: drains the send queue, batching whatever piled up meanwhile."""
+        try:
+            while True:
+                await self.queue_ready.wait()
+                if self.coalesce_window:
+                    await asyncio.sleep(self.coalesce_window)
+                # Hold back while the client is still working through what it has
+                await self.ack_window.wait()
+                self.queue_ready.clear()
+                frames = [frame for _, frame in self.send_queue.values()]
+                self.send_queue.clear()
+                if len(frames) == 1:
+                    await self.send_frame(frames[0])
+                elif frames:
+                    await self.send_frame({'type': 'batch', 'events': frames, 'seq': frames[-1].get('seq')})
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error writing inbox events: {str(e)}")
+
+    async def close_lagging(self, reason):
+        global _lag_disconnects
+        self.lagging = True
+        _lag_disconnects += 1
+        self.send_queue.clear()
+        if self.writer_task is not None:
+            self.writer_task.cancel()
+        logger.warning(f"Closing slow inbox socket for {self.room_group_name}: {reason}")
+        await self.close(code=CLOSE_CODE_LAGGING)
+
     @database_sync_to_async
     def get_profile_pk(self):
         """
-        Get the seller profile PK for the current user.
-        Returns None if the user has no seller profile.
+        Get the seller profile PK for a database-backed user (tokens issued
+        before the seller_id claim). Returns None if the user has no seller profile.
         """
         try:
             return self.user.seller_profile.pk
@@ -77,6 +305,23 @@ class InboxConsumer(AsyncWebsocketConsumer):
         Called when the WebSocket closes for any reason.
         """
         logger.info(f"WebSocket disconnecting with code: {close_code}")
+
+        if getattr(self, 'writer_task', None) is not None:
+            self.writer_task.cancel()
+        for timer in getattr(self, 'row_timers', {}).values():
+            timer.cancel()
+        stats = getattr(self, 'stats', None)
+        if stats:
+            _live_consumers.discard(self)
+            for key in _closed_totals:
+                _closed_totals[key] += stats[key]
+        if stats and stats['events']:
+            logger.info(
+                f"Inbox socket stats for {self.room_group_name}: {stats['events']} events in "
+                f"{stats['frames']} frames, {stats['bytes']} bytes "
+                f"({stats['bytes'] / stats['events']:.0f} bytes/event, "
+                f"{'msgpack' if self.use_msgpack else 'json'})"
+            )
         
         if self.room_group_name and self.channel_layer:
             try:
@@ -88,12 +333,15 @@ class InboxConsumer(AsyncWebsocketConsumer):
             except Exception as e:
                 logger.error(f"Error during group discard: {str(e)}")
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """
         Called when a message is received from the WebSocket.
         """
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = json.loads(text_data) if text_data is not None else msgpack.unpackb(bytes_data)
+            if text_data_json.get('type') == 'ack':
+                self.handle_ack(int(text_data_json.get('frames', 0)))
+                return
             message = text_data_json.get('message', '')
             
             logger.info(f"Received message from {self.user.username}: {message}")
@@ -104,7 +352,7 @@ class InboxConsumer(AsyncWebsocketConsumer):
                 'message': f"You said: {message}"
             }))
             
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, msgpack.UnpackException):
             logger.error("Invalid JSON received")
             await self.send(text_data=json.dumps({
                 'type': 'error',
@@ -118,13 +366,9 @@ class InboxConsumer(AsyncWebsocketConsumer):
         Called when a new_order_notification event is sent to the group.
         """
         try:
-            order_data = event.get('order', {})
             logger.info(f"Sending 'new_order' notification to group {self.room_group_name}")
             
-            await self.send(text_data=json.dumps({
-                'type': 'new_order', 
-                'payload': order_data
-            }))
+            await self.queue_frame(event_frame(event))
             
         except Exception as e:
             logger.error(f"Error sending new order notification: {str(e)}")
@@ -138,10 +382,9 @@ class InboxConsumer(AsyncWebsocketConsumer):
             order_data = event.get('order', {})
             logger.info(f"Sending order status update to group {self.room_group_name}")
             
-            await self.send(text_data=json.dumps({
-                'type': 'order_status_update',
-                'payload': order_data
-            }))
+            # Only the latest status of an order matters to the dashboard
+            coalesce_key = ('order_status_update', order_data['id']) if order_data.get('id') is not None else None
+            await self.queue_frame(event_frame(event), coalesce_key=coalesce_key)
             
         except Exception as e:
             logger.error(f"Error sending order status update: {str(e)}")
@@ -151,13 +394,48 @@ class InboxConsumer(AsyncWebsocketConsumer):
         Handle custom messages sent to the group.
         """
         try:
-            message = event.get('message', '')
-            message_type = event.get('message_type', 'custom')
-            
-            await self.send(text_data=json.dumps({
-                'type': message_type,
-                'message': message
-            }))
+            await self.queue_frame(event_frame(event))
             
         except Exception as e:
-            logger.error(f"Error sending custom message: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error sending custom message: {str(e)}")
+
+    async def conversation_updated(self, event):
+        """
+        A conversation's list row changed (new message, unread count). The
+        dashboard moves the row to the top; bursts for one conversation are
+        throttled so only the latest row goes out per interval.
+        """
+        try:
+            frame = event_frame(event)
+            conversation_id = frame['payload'].get('id')
+            if conversation_id is None:
+                await self.queue_frame(frame)
+                return
+
+            if conversation_id in self.held_rows:
+                self.held_rows[conversation_id] = frame
+                self.stats['coalesced'] += 1
+                return
+            wait = self.row_sent_at.get(conversation_id, float('-inf')) + self.row_interval - time.monotonic()
+            if wait <= 0:
+                await self.queue_row(conversation_id, frame)
+                return
+            self.held_rows[conversation_id] = frame
+            self.row_timers[conversation_id] = asyncio.ensure_future(self.queue_held_row(conversation_id, wait))
+
+        except Exception as e:
+            logger.error(f"Error sending conversation update: {str(e)}")
+
+    async def queue_row(self, conversation_id, frame):
+        self.row_sent_at[conversation_id] = time.monotonic()
+        await self.queue_frame(frame, coalesce_key=('conversation_updated', conversation_id))
+
+    async def queue_held_row(self, conversation_id, delay):
+        try:
+            await asyncio.sleep(delay)
+            self.row_timers.pop(conversation_id, None)
+            await self.queue_row(conversation_id, self.held_rows.pop(conversation_id))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending held conversation update: {str(e)}")
@@ -2,7 +2,8 @@
 from .models import Conversation
 from products.models import Product
 from orders.models import Order, OrderItem
-from payments.services import initiate_stk_push
+from products.inventory import reserve_stock
+from .order_parser import parse_order_text
 
 def _send_product_list_message(conversation, products, title="Our Products"):
     """Helper function to build and return an interactive list of products."""
@@ -70,6 +71,53 @@ def _send_product_details_interactive(conversation, product):
     return interactive_payload
 
 
+def _send_size_selection_interactive(conversation, product):
+    """Builds the size picker for a product and moves the conversation to size selection."""
+    conversation.state = Conversation.ConversationState.AWAITING_SIZE_SELECTION
+    if len(product.sizes) <= 3:
+        buttons = [{"type": "reply", "reply": {"id": f"select_size_{s}", "title": str(s)[:20]}} for s in product.sizes]
+        return {"type": "interactive", "interactive": {"type": "button", "body": {"text": f"Please select a size for the *{product.name}*:"}, "action": {"buttons": buttons}}}
+    else:
+        rows = [{"id": f"select_size_{s}", "title": str(s)[:24]} for s in product.sizes[:10]]
+        return {"type": "interactive", "interactive": {"type": "list", "header": {"type": "text", "text": "Available Sizes"}, "body": {"text": f"Please choose a size for the *{product.name}*:"}, "action": {"button": "View Sizes", "sections": [{"title": "Sizes", "rows": rows}]}}}
+
+
+def _try_quick_order(conversation, message_text):
+    """
+    Handles free-text orders like "2 black hoodies size L" in one step.
+    Returns None when the text doesn't name a single product together with a
+    quantity or size, so the caller can fall back to its normal flow.
+    """
+    parsed = parse_order_text(conversation.seller, message_text)
+    if parsed is None or (parsed.quantity is None and parsed.size is None):
+        return None
+
+    try:
+        product = conversation.seller.products.get(id=parsed.product_id, is_active=True)
+    except Product.DoesNotExist:
+        return None
+
+    conversation.context['viewed_product_id'] = product.id
+    conversation.context.pop('pending_quantity', None)
+    if product.sizes and not parsed.size:
+        # Remember the quantity so the size reply can go straight to the cart
+        if parsed.quantity:
+            conversation.context['pending_quantity'] = parsed.quantity
+        return _send_size_selection_interactive(conversation, product)
+
+    if parsed.size:
+        conversation.context['selected_size'] = parsed.size
+    if not parsed.quantity:
+        conversation.state = Conversation.ConversationState.AWAITING_QUANTITY
+        return f"Got it, *{product.name}*{f' (Size: {parsed.size})' if parsed.size else ''}. How many would you like to add?"
+
+    response_payload = add_item_to_cart(conversation, product.id, parsed.quantity, parsed.size)
+    conversation.context.pop('viewed_product_id', None)
+    conversation.context.pop('selected_size', None)
+    conversation.state = Conversation.ConversationState.AWAITING_COMMAND
+    return response_payload
+
+
 def handle_state_started(conversation, message_details):
     seller = conversation.seller
     response_text = f"Hello! Welcome to {seller.company_name or seller.user.username}. How can I help you? You can ask me to 'show products' or type 'menu'."
@@ -96,6 +144,13 @@ def handle_state_awaiting_command(conversation, message_details):
 
     # The 'view_cart' button is handled by the global router in process_message
 
+    # Free-text orders ("2 black hoodies size L") skip the menu entirely
+    message_text = message_details.get('text', {}).get('body', '')
+    if message_text:
+        quick_order_payload = _try_quick_order(conversation, message_text)
+        if quick_order_payload:
+            return quick_order_payload
+
     # --- Part 2: If no button was clicked, or it was a text command, SHOW the main menu ---
     body_text = (
         f"You are at the main menu for *{seller.company_name or seller.user.username}*.\n\n"
@@ -144,6 +199,11 @@ def handle_state_awaiting_product_selection(conversation, message_details):
     if not message_text:
         return "Please tell me which product you're interested in, or type 'menu'."
 
+    # Try to resolve product, quantity and size in one go before falling back to a name search
+    quick_order_payload = _try_quick_order(conversation, message_text)
+    if quick_order_payload:
+        return quick_order_payload
+
     matching_products = seller.products.filter(name__icontains=message_text, is_active=True)
     product_count = matching_products.count()
 
@@ -191,15 +251,10 @@ def handle_state_awaiting_product_action(conversation, message_details):
                 product_id = int(button_id.split('_')[-1])
                 product = Product.objects.get(id=product_id, seller=conversation.seller)
                 conversation.context['viewed_product_id'] = product.id
+                conversation.context.pop('pending_quantity', None)
 
                 if product.sizes:
-                    conversation.state = Conversation.ConversationState.AWAITING_SIZE_SELECTION
-                    if len(product.sizes) <= 3:
-                        buttons = [{"type": "reply", "reply": {"id": f"select_size_{s}", "title": str(s)[:20]}} for s in product.sizes]
-                        return {"type": "interactive", "interactive": {"type": "button", "body": {"text": f"Please select a size for the *{product.name}*:"}, "action": {"buttons": buttons}}}
-                    else:
-                        rows = [{"id": f"select_size_{s}", "title": str(s)[:24]} for s in product.sizes[:10]]
-                        return {"type": "interactive", "interactive": {"type": "list", "header": {"type": "text", "text": "Available Sizes"}, "body": {"text": f"Please choose a size for the *{product.name}*:"}, "action": {"button": "View Sizes", "sections": [{"title": "Sizes", "rows": rows}]}}}
+                    return _send_size_selection_interactive(conversation, product)
                 else:
                     conversation.state = Conversation.ConversationState.AWAITING_QUANTITY
                     return "Got it. How many would you like to add?"
@@ -234,6 +289,15 @@ def handle_state_awaiting_size_selection(conversation, message_details):
             
             # Save the chosen size to the conversation's memory (context)
             conversation.context['selected_size'] = selected_size
+
+            # The quantity was already given in a free-text order, so add straight to the cart
+            pending_quantity = conversation.context.pop('pending_quantity', None)
+            if pending_quantity:
+                response_payload = add_item_to_cart(conversation, conversation.context.get('viewed_product_id'), pending_quantity, selected_size)
+                conversation.context.pop('viewed_product_id', None)
+                conversation.context.pop('selected_size', None)
+                conversation.state = Conversation.ConversationState.AWAITING_COMMAND
+                return response_payload
             
             # Transition to the next state: asking for quantity
             conversation.state = Conversation.ConversationState.AWAITING_QUANTITY
@@ -279,11 +343,19 @@ def add_item_to_cart(conversation, product_id, quantity, size):
             status=Order.OrderStatus.IN_PROGRESS
         )
 
+        # Units held by other customers' checkouts are not for sale
+        in_cart = sum(cart.items.filter(product=product).values_list('quantity', flat=True))
+        available = product.inventory_count - product.reserved_count
+        if in_cart + quantity > available:
+            if available - in_cart <= 0:
+                return f"Sorry, *{product.name}* is currently out of stock."
+            return f"Sorry, only {available - in_cart} more of *{product.name}* available right now."
+
         order_item, created = OrderItem.objects.get_or_create(
             order=cart,
             product=product,
             selected_size=size,
-            defaults={'price_at_time_of_purchase': product.price}
+            defaults={'price_at_time_of_purchase': product.price, **OrderItem.product_snapshot(product)}
         )
 
         if not created:
@@ -362,7 +434,7 @@ def handle_state_viewing_cart(conversation, message_details):
         for item in order_items:
             item_total = item.quantity * item.price_at_time_of_purchase
             size_info = f" (Size: {item.selected_size})" if item.selected_size else ""
-            cart_details_list.append(f"- {item.quantity} x {item.product.name}{size_info}: ${item_total:.2f}")
+            cart_details_list.append(f"- {item.quantity} x {item.product_name or 'Deleted Product'}{size_info}: ${item_total:.2f}")
         
         cart_details_text = "\n".join(cart_details_list)
         body_text = (
@@ -461,7 +533,9 @@ def handle_state_awaiting_delivery_address(conversation, message_details):
     
 def handle_state_awaiting_payment_confirmation(conversation, message_details):
     """
-    This state's only job is to trigger the STK push by calling the M-Pesa service.
+    Reserves the cart's stock, hands the cart over to the payment worker and
+    replies straight away. The worker (`manage.py run_payment_worker`) sends the
+    STK push and tells the customer if it could not be initiated.
     """
     try:
         cart = Order.objects.get(
@@ -469,26 +543,26 @@ def handle_state_awaiting_payment_confirmation(conversation, message_details):
             seller=conversation.seller,
             status=Order.OrderStatus.IN_PROGRESS
         )
-        
-        # Call our centralized M-Pesa service
-        response = initiate_stk_push(
-            phone_number=conversation.customer.phone_number,
-            amount=cart.total_amount,
-            order_id=cart.id
-            # The callback URL is now handled inside the service itself
-        )
 
-        if response and response.get('ResponseCode') == '0':
-            # STK Push was successfully initiated by the service
-            order = cart # Use the same object
-            order.status = Order.OrderStatus.PENDING_PAYMENT
-            order.mpesa_checkout_request_id = response.get('CheckoutRequestID')
-            order.save()
-            
-            return "A payment prompt has been sent to your phone. Please enter your M-Pesa PIN to complete the transaction."
-        else:
-            # STK push initiation failed
-            return "We couldn't initiate the payment request at this time. Please try again shortly by typing 'checkout'."
+        # Hold the stock until the payment settles or the hold expires
+        quantities = {}
+        for product_id, quantity in cart.items.values_list('product_id', 'quantity'):
+            if product_id:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+        unavailable = reserve_stock(cart, quantities)
+        if unavailable:
+            names = Product.objects.filter(id__in=unavailable).values_list('name', flat=True)
+            conversation.state = Conversation.ConversationState.AWAITING_COMMAND
+            return (
+                "Sorry, we don't have enough stock left for: "
+                + ", ".join(f"*{name}*" for name in names)
+                + ". Please start a new order or contact the seller."
+            )
+
+        cart.status = Order.OrderStatus.PAYMENT_REQUESTED
+        cart.save(update_fields=['status', 'updated_at'])
+
+        return "A payment prompt is on its way to your phone. Please enter your M-Pesa PIN to complete the transaction."
 
     except Order.DoesNotExist:
-        return "Sorry, I couldn't find your cart to proceed with payment."
\ No newline at end of file
+        return "Sorry, I couldn't find your cart to proceed with payment."
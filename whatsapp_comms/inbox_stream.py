@@ -0,0 +1,105 @@
+"""
+Sequence-numbered inbox events.
+
+Every event for a seller's inbox is appended to a capped Redis stream before it
+is broadcast to the channel group, and carries the stream entry id as its `seq`.
+A reconnecting dashboard sends the last `seq` it saw; InboxConsumer replays the
+entries after it, or asks for a full resync when the gap has been trimmed away.
+"""
+import json
+import logging
+
+import redis
+import redis.asyncio
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_async_clients = {}
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def _async_redis():
+    # redis.asyncio connections are bound to the event loop that created them
+    import asyncio
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return client
+
+
+def stream_key(group_name):
+    return f"{group_name}:stream"
+
+
+def parse_seq(seq):
+    """Stream ids look like "1718000000000-3"; returns a comparable tuple, or None if malformed."""
+    try:
+        millis, _, counter = str(seq).partition('-')
+        return int(millis), int(counter or 0)
+    except ValueError:
+        return None
+
+
+def publish_inbox_event(group_name, event):
+    """
+    Appends the event to the group's stream and broadcasts it with its `seq`.
+    If Redis can't be reached the event is still broadcast, just without a seq.
+    """
+    try:
+        seq = _redis().xadd(
+            stream_key(group_name),
+            {'event': json.dumps(event)},
+            maxlen=settings.INBOX_STREAM_MAXLEN,
+            approximate=True,
+        )
+        event = {**event, 'seq': seq.decode()}
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Could not append inbox event to stream for {group_name}: {e}")
+    async_to_sync(get_channel_layer().group_send)(group_name, event)
+    return event.get('seq')
+
+
+async def latest_seq(group_name):
+    """The seq of the newest event in the stream, or None if it is empty or unavailable."""
+    try:
+        entries = await _async_redis().xrevrange(stream_key(group_name), count=1)
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Could not read inbox stream for {group_name}: {e}")
+        return None
+    return entries[0][0].decode() if entries else None
+
+
+async def events_since(group_name, last_seq):
+    """
+    Returns the events after `last_seq`, oldest first, or None when they can't be
+    replayed (the client's position was trimmed from the stream, or Redis is down).
+    """
+    position = parse_seq(last_seq)
+    if position is None:
+        return None
+    key = stream_key(group_name)
+    try:
+        client = _async_redis()
+        oldest = await client.xrange(key, count=1)
+        if not oldest or parse_seq(oldest[0][0].decode()) > position:
+            # The client's last event is no longer in the stream, so there may be a gap
+            return None
+        entries = await client.xrange(key, min=f"({position[0]}-{position[1]}", max='+')
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Could not replay inbox stream for {group_name}: {e}")
+        return None
+    return [
+        {**json.loads(fields[b'event']), 'seq': entry_id.decode()}
+        for entry_id, fields in entries
+    ]
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core_backend.channel_layers import channel_layer_config
+from core_backend.middleware import TokenAuthMiddleware
+from whatsapp_comms.consumers import InboxConsumer
+
+# Synthetic seller ids, far away from real ones so no dashboard sees benchmark traffic
+BENCH_SELLER_BASE = 900_000_000
+
+
+def _rss_bytes():
+    """Current resident set size, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _percentile(values, fraction):
+    return values[max(0, math.ceil(len(values) * fraction) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Opens many authenticated /ws/inbox/ sockets in this process (one daphne worker's "
+        "worth of InboxConsumers), drives group_send at a fixed rate and reports delivery "
+        "latency and memory per connection for each channel layer variant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=1000)
+        parser.add_argument('--sellers', type=int, default=50, help="Groups the sockets are spread over.")
+        parser.add_argument('--rate', type=float, default=200, help="group_send calls per second.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds to keep sending.")
+        parser.add_argument('--layers', default='core,pubsub',
+                            help="Comma-separated: core, pubsub, memory (in-process baseline).")
+        parser.add_argument('--redis-urls', default=None,
+                            help="Comma-separated Redis URLs (defaults to REDIS_URLS). With more than one, "
+                                 "each Redis layer runs on the first host alone and sharded across all.")
+        parser.add_argument('--coalesce-ms', type=int, default=None,
+                            help="Override INBOX_COALESCE_WINDOW_MS for the run.")
+        parser.add_argument('--connect-batch', type=int, default=200, help="Sockets opened concurrently.")
+
+    def handle(self, *args, **options):
+        redis_urls = (
+            [url.strip() for url in options['redis_urls'].split(',') if url.strip()]
+            if options['redis_urls'] else settings.REDIS_URLS
+        )
+        variants = []
+        for layer in [name.strip() for name in options['layers'].split(',') if name.strip()]:
+            if layer == 'memory':
+                variants.append(('memory', {"BACKEND": "channels.layers.InMemoryChannelLayer"}))
+                continue
+            try:
+                variants.append((f"{layer} x1", channel_layer_config(layer, redis_urls[:1])))
+                if len(redis_urls) > 1:
+                    variants.append((f"{layer} x{len(redis_urls)}", channel_layer_config(layer, redis_urls)))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        coalesce_ms = options['coalesce_ms'] if options['coalesce_ms'] is not None else settings.INBOX_COALESCE_WINDOW_MS
+        self.stdout.write(
+            f"{options['sockets']} sockets over {options['sellers']} groups, "
+            f"{options['rate']:.0f} group_send/s for {options['duration']:.0f}s, coalesce window {coalesce_ms}ms"
+        )
+        for label, layer_config in variants:
+            with override_settings(CHANNEL_LAYERS={"default": layer_config}, INBOX_COALESCE_WINDOW_MS=coalesce_ms):
+                result = asyncio.run(self._run(options))
+            self._report(label, result)
+
+    async def _run(self, options):
+        sellers = options['sellers']
+        app = TokenAuthMiddleware(InboxConsumer.as_asgi())
+        layer = get_channel_layer()
+        groups = [f'seller_inbox_{BENCH_SELLER_BASE + i}' for i in range(sellers)]
+
+        # Real signed tokens with the seller_id claim, so sockets authenticate
+        # through TokenAuthMiddleware exactly as dashboards do (no database)
+        tokens = []
+        for i in range(sellers):
+            token = AccessToken()
+            token['user_id'] = BENCH_SELLER_BASE + i
+            token['seller_id'] = BENCH_SELLER_BASE + i
+            token['username'] = f"bench-{i}"
+            tokens.append(str(token))
+
+        latencies = []
+        delivered = [0]
+
+        async def read(communicator):
+            while True:
+                message = await communicator.output_queue.get()
+                if message['type'] != 'websocket.send' or not message.get('text'):
+                    continue
+                received_at = time.perf_counter()
+                frame = json.loads(message['text'])
+                for event in frame['events'] if frame['type'] == 'batch' else [frame]:
+                    if event.get('type') == 'bench':
+                        latencies.append(received_at - event['message']['sent_at'])
+                        delivered[0] += 1
+
+        rss_before = _rss_bytes()
+        connect_started = time.perf_counter()
+        communicators = []
+        for start in range(0, options['sockets'], options['connect_batch']):
+            batch = [
+                WebsocketCommunicator(app, f"/ws/inbox/?token={tokens[i % sellers]}")
+                for i in range(start, min(start + options['connect_batch'], options['sockets']))
+            ]
+            results = await asyncio.gather(*(communicator.connect(timeout=30) for communicator in batch))
+            communicators.extend(c for c, (connected, _) in zip(batch, results) if connected)
+        connect_seconds = time.perf_counter() - connect_started
+        rss_after = _rss_bytes()
+        readers = [asyncio.ensure_future(read(communicator)) for communicator in communicators]
+
+        # Sockets per group, to know how many deliveries each send should produce
+        per_group = [0] * sellers
+        for i in range(len(communicators)):
+            per_group[i % sellers] += 1
+
+        total_sends = int(options['rate'] * options['duration'])
+        expected = 0
+        send_started = time.perf_counter()
+        for n in range(total_sends):
+            delay = send_started + n / options['rate'] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await layer.group_send(groups[n % sellers], {
+                'type': 'custom_message',
+                'message_type': 'bench',
+                'message': {'sent_at': time.perf_counter()},
+            })
+            expected += per_group[n % sellers]
+        send_seconds = time.perf_counter() - send_started
+
+        # Let in-flight events drain; stop once nothing has arrived for a while
+        last_count, quiet_since = -1, time.perf_counter()
+        while delivered[0] < expected and time.perf_counter() - quiet_since < 5:
+            if delivered[0] != last_count:
+                last_count, quiet_since = delivered[0], time.perf_counter()
+            await asyncio.sleep(0.1)
+
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*(communicator.disconnect(timeout=10) for communicator in communicators),
+                             return_exceptions=True)
+
+        return {
+            'sockets': len(communicators),
+            'connect_seconds': connect_seconds,
+            'rss_per_socket': (rss_after - rss_before) / len(communicators)
+            if communicators and rss_before is not None else None,
+            'send_rate': total_sends / send_seconds if send_seconds else 0,
+            'expected': expected,
+            'delivered': delivered[0],
+            'latencies': sorted(latencies),
+        }
+
+    def _report(self, label, result):
+        latencies = result['latencies']
+        if latencies:
+            latency = (
+                f"p50={statistics.median(latencies) * 1000:.1f}ms "
+                f"p95={_percentile(latencies, 0.95) * 1000:.1f}ms "
+                f"p99={_percentile(latencies, 0.99) * 1000:.1f}ms"
+            )
+        else:
+            latency = "no deliveries"
+        memory = f"{result['rss_per_socket'] / 1024:.1f} KiB/socket" if result['rss_per_socket'] is not None else "memory n/a"
+        delivered = result['delivered'] / result['expected'] * 100 if result['expected'] else 0
+        self.stdout.write(
+            f"[{label}] {result['sockets']} sockets connected in {result['connect_seconds']:.1f}s, {memory}; "
+            f"sent {result['send_rate']:.0f}/s, delivered {result['delivered']}/{result['expected']} "
+            f"({delivered:.1f}%); {latency}"
+        )
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from whatsapp_comms.outbox import publish_pending_events
+
+
+class Command(BaseCommand):
+    help = "Publishes committed outbox events (WhatsApp messages and inbox WebSocket events)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--once', action='store_true', help="Publish what is pending once and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Outbox relay started.")
+        while True:
+            while publish_pending_events(options['batch_size']) == options['batch_size']:
+                pass
+            if options['once']:
+                break
+            time.sleep(settings.OUTBOX_RELAY_POLL_INTERVAL)
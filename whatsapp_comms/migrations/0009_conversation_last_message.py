@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Substr
+
+
+def backfill_last_message(apps, schema_editor):
+    """Points every conversation at its latest message, set-wise in one UPDATE."""
+    Conversation = apps.get_model('whatsapp_comms', 'Conversation')
+    Message = apps.get_model('whatsapp_comms', 'Message')
+
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+    Conversation.objects.filter(Exists(latest)).update(
+        last_message_id=Subquery(latest.values('id')[:1]),
+        last_message_preview=Subquery(latest.annotate(preview=Substr('content', 1, 255)).values('preview')[:1]),
+        last_message_sender=Subquery(latest.values('sender')[:1]),
+        last_message_at=Subquery(latest.values('timestamp')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_comms', '0008_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='whatsapp_comms.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_sender',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['seller', '-updated_at'], name='conversation_seller_upd_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
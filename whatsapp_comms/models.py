@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from sellers.models import SellerProfile
 
+# Length of the message preview kept on Conversation for the inbox list
+MESSAGE_PREVIEW_LENGTH = 255
+
 class Customer(models.Model):
     phone_number = models.CharField(max_length=20, unique=True, primary_key=True)
     name = models.CharField(max_length=255, blank=True, null=True)
@@ -30,16 +35,54 @@ class Conversation(models.Model):
         default=ConversationState.STARTED
     )
     context = models.JSONField(default=dict, blank=True)
+
+    # Denormalized from the latest Message so the inbox list needs no per-row
+    # queries. Maintained by Message.objects.create_in_conversation().
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=MESSAGE_PREVIEW_LENGTH, blank=True, default='')
+    last_message_sender = models.CharField(max_length=10, blank=True, default='')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # Customer messages the seller hasn't read yet
+    unread_count = models.PositiveIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('customer', 'seller')
+        indexes = [
+            # The inbox lists a seller's conversations, most recently active first
+            models.Index(fields=['seller', '-updated_at', '-id'], name='conversation_seller_upd_idx'),
+        ]
 
     def __str__(self):
         return f"Conversation with {self.customer} for {self.seller.user.username} - State: {self.get_state_display()}"
 
 
+class MessageManager(models.Manager):
+    def create_in_conversation(self, conversation, sender, content):
+        """
+        Creates a message and, in the same transaction, updates the conversation's
+        last-message fields and unread count with one UPDATE.
+        Customer messages bump the unread count; a seller reply clears it.
+        """
+        with transaction.atomic():
+            message = self.create(conversation=conversation, sender=sender, content=content)
+            fields = {
+                'last_message': message,
+                'last_message_preview': content[:MESSAGE_PREVIEW_LENGTH],
+                'last_message_sender': sender,
+                'last_message_at': message.timestamp,
+                'updated_at': message.timestamp,
+            }
+            if sender == 'customer':
+                fields['unread_count'] = F('unread_count') + 1
+            elif sender == 'seller':
+                fields['unread_count'] = 0
+            Conversation.objects.filter(pk=conversation.pk).update(**fields)
+        return message
+
+
 class Message(models.Model):
     """Stores individual chat messages for a conversation."""
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
@@ -50,8 +93,46 @@ class Message(models.Model):
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    objects = MessageManager()
+
     class Meta:
         ordering = ["timestamp"]
+        indexes = [
+            # Message history is paged newest first per conversation
+            models.Index(fields=['conversation', '-timestamp', '-id'], name='message_conv_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender} at {self.timestamp:%Y-%m-%d %H:%M}: {self.content[:20]}"
+
+class OutboxEvent(models.Model):
+    """
+    A side effect (WhatsApp message or inbox WebSocket event) recorded in the same
+    transaction as the change that caused it. The outbox relay publishes it after
+    commit, retrying with exponential backoff until it succeeds (at-least-once
+    delivery) or runs out of attempts.
+    """
+    class Kind(models.TextChoices):
+        WHATSAPP_MESSAGE = 'WHATSAPP_MESSAGE', 'WhatsApp Message'
+        INBOX_EVENT = 'INBOX_EVENT', 'Inbox Event'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    # Customer phone number for WhatsApp messages, channel group name for inbox events
+    recipient = models.CharField(max_length=100)
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    # Not published before this time: pushed back after each failure, and
+    # while a relay has the event claimed
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The relay only ever scans unpublished events, oldest first
+            models.Index(fields=['id'], condition=models.Q(published_at__isnull=True), name='outbox_unpublished_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.sender} at {self.timestamp:%Y-%m-%d %H:%M}: {self.content[:20]}"
\ No newline at end of file
+        return f"{self.get_kind_display()} to {self.recipient} ({'published' if self.published_at else 'pending'})"
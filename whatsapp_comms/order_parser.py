@@ -0,0 +1,320 @@
+"""
+Free-text order parsing for the WhatsApp bot.
+
+Customers often type a whole order in one message, e.g. "2 black hoodies size L".
+For each seller we precompile an Aho-Corasick automaton over product names, SKUs
+and sizes, so a message is resolved into (product, quantity, size) in a single
+pass over its characters instead of a chain of button round trips.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from products.models import CATALOG_FIELDS, Product
+
+ParsedOrder = namedtuple('ParsedOrder', ['product_id', 'quantity', 'size'])
+
+NUMBER_WORDS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+SIZE_KEYWORDS = ('size', 'sz')
+# Longer digit runs are never read as a quantity
+MAX_QUANTITY_DIGITS = 4
+# A quantity may be written with a multiplier sign, as in "x2" or "3x"
+MULTIPLIERS = ('x', '×')
+
+# Pattern kinds stored in the automaton outputs
+KIND_PRODUCT = 'product'
+KIND_SIZE = 'size'
+KIND_NUMBER = 'number'
+KIND_KEYWORD = 'keyword'
+
+
+class AhoCorasick:
+    """A small Aho-Corasick automaton mapping lowercase patterns to values."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][char] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append((len(pattern), value))
+
+    def build(self):
+        """Computes failure links breadth-first. Must be called after the last add()."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def step(self, node, char):
+        while node and char not in self.goto[node]:
+            node = self.fail[node]
+        return self.goto[node].get(char, 0)
+
+
+def _quantity_span(text, start, end):
+    """
+    The span of the quantity token around the digit run text[start:end]: the
+    digits alone or with a multiplier before or after them ("2", "x2", "3x").
+    None if the token isn't standalone or the run is too long to be a quantity
+    (a phone number or an id).
+    """
+    if end - start > MAX_QUANTITY_DIGITS:
+        return None
+    if start > 0 and text[start - 1] in MULTIPLIERS:
+        start -= 1
+    elif end < len(text) and text[end] in MULTIPLIERS:
+        end += 1
+    if (start > 0 and text[start - 1].isalnum()) or (end < len(text) and text[end].isalnum()):
+        return None
+    return start, end
+
+
+def _normalize_size(size):
+    """Sizes are stored either as plain values or as {"size": "S", ...} dicts."""
+    if isinstance(size, dict):
+        size = size.get('size')
+    return str(size).strip() if size not in (None, '') else None
+
+
+def _name_variants(name):
+    """The product name plus simple plural forms of its last word."""
+    name = ' '.join(name.lower().split())
+    if not name:
+        return []
+    variants = {name, f"{name}s", f"{name}es"}
+    if name.endswith('y'):
+        variants.add(f"{name[:-1]}ies")
+    return variants
+
+
+def _apply(products, patterns, known_ids, product):
+    """Replaces one product's entries in the matcher tables."""
+    known_ids.add(product.id)
+    products.pop(product.id, None)
+    patterns.pop(product.id, None)
+    if not product.is_active:
+        return
+
+    sizes = [s for s in (_normalize_size(size) for size in product.sizes or []) if s]
+    product_patterns = [(variant, (KIND_PRODUCT, product.id)) for variant in _name_variants(product.name)]
+    if product.sku:
+        product_patterns.append((product.sku.lower(), (KIND_PRODUCT, product.id)))
+    product_patterns.extend((size.lower(), (KIND_SIZE, size)) for size in sizes)
+
+    products[product.id] = sizes
+    patterns[product.id] = product_patterns
+
+
+def _build_automaton(patterns):
+    automaton = AhoCorasick()
+    for product_patterns in patterns.values():
+        for pattern, value in product_patterns:
+            automaton.add(pattern, value)
+    for word, number in NUMBER_WORDS.items():
+        automaton.add(word, (KIND_NUMBER, number))
+    for keyword in SIZE_KEYWORDS:
+        automaton.add(keyword, (KIND_KEYWORD, keyword))
+    automaton.build()
+    return automaton
+
+
+class CatalogMatcher:
+    """
+    Per-seller matcher. Patterns are kept per product so a product change only
+    replaces that product's entries; the automaton itself is rebuilt from
+    memory, never by re-reading the whole catalog.
+
+    A refresh builds new tables and a new automaton, then swaps them in with
+    one assignment of `state`, so parses running on other threads keep a
+    consistent snapshot. The catalog is checked for changes at most once
+    every CATALOG_MATCHER_REFRESH_SECONDS, keyed on Product.catalog_updated_at
+    so stock movements don't trigger a rebuild.
+    """
+
+    def __init__(self, seller_id):
+        self.seller_id = seller_id
+        # (product_id -> normalized sizes of active products,
+        #  product_id -> [(pattern, value), ...], automaton)
+        self.state = ({}, {}, _build_automaton({}))
+        self.known_ids = set()  # every product id seen, active or not
+        self.catalog_updated_at = None
+        self.checked_at = None  # monotonic time of the last change check
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Brings the matcher up to date with the seller's catalog."""
+        interval = settings.CATALOG_MATCHER_REFRESH_SECONDS
+        if self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+            return
+
+        with self.lock:
+            # Another thread may have just checked
+            if self.checked_at is not None and time.monotonic() - self.checked_at < interval:
+                return
+            self.checked_at = time.monotonic()
+
+            stamp = Product.objects.filter(seller_id=self.seller_id).aggregate(
+                catalog_updated_at=Max('catalog_updated_at'), total=Count('id')
+            )
+            if stamp['catalog_updated_at'] == self.catalog_updated_at and stamp['total'] == len(self.known_ids):
+                return
+
+            products, patterns, _ = self.state
+            products, patterns, known_ids = dict(products), dict(patterns), set(self.known_ids)
+            changed = Product.objects.filter(seller_id=self.seller_id)
+            if self.catalog_updated_at is not None:
+                # Only re-read products whose catalog fields changed since the last refresh
+                changed = changed.filter(catalog_updated_at__gte=self.catalog_updated_at)
+            for product in changed.only('id', *CATALOG_FIELDS):
+                _apply(products, patterns, known_ids, product)
+
+            if len(known_ids) != stamp['total']:
+                # Products were hard-deleted, start over from a clean slate
+                products, patterns, known_ids = {}, {}, set()
+                for product in Product.objects.filter(seller_id=self.seller_id).only('id', *CATALOG_FIELDS):
+                    _apply(products, patterns, known_ids, product)
+
+            self.state = (products, patterns, _build_automaton(patterns))
+            self.known_ids = known_ids
+            self.catalog_updated_at = stamp['catalog_updated_at']
+
+    def scan(self, text, automaton=None):
+        """
+        Single pass over lowercased text. Returns word-bounded pattern matches
+        and standalone quantity tokens (up to MAX_QUANTITY_DIGITS digits,
+        optionally with a multiplier) as (start, end, kind, value) tuples.
+        """
+        automaton = automaton or self.state[2]
+        length = len(text)
+        matches = []
+        node = 0
+        digit_start = None
+
+        for index, char in enumerate(text):
+            # Digit runs are collected in the same loop as the automaton walk
+            if char.isdigit():
+                if digit_start is None:
+                    digit_start = index
+            elif digit_start is not None:
+                span = _quantity_span(text, digit_start, index)
+                if span:
+                    matches.append((*span, KIND_NUMBER, int(text[digit_start:index])))
+                digit_start = None
+
+            node = automaton.step(node, char)
+            if not automaton.outputs[node]:
+                continue
+            end = index + 1
+            if end < length and text[end].isalnum():
+                continue
+            for pattern_length, (kind, value) in automaton.outputs[node]:
+                start = end - pattern_length
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                matches.append((start, end, kind, value))
+
+        if digit_start is not None:
+            span = _quantity_span(text, digit_start, length)
+            if span:
+                matches.append((*span, KIND_NUMBER, int(text[digit_start:])))
+        return matches
+
+    def parse(self, text):
+        """Resolves a message into a ParsedOrder, or None if no single product matched."""
+        text = text.lower()
+        products, _, automaton = self.state
+        matches = self.scan(text, automaton)
+
+        product_matches = [m for m in matches if m[2] == KIND_PRODUCT]
+        if not product_matches:
+            return None
+        longest = max(end - start for start, end, _, _ in product_matches)
+        best = {m[3] for m in product_matches if m[1] - m[0] == longest}
+        if len(best) != 1:
+            return None
+        product_id = best.pop()
+        product_span = next(m for m in product_matches if m[3] == product_id and m[1] - m[0] == longest)
+
+        def overlaps(match, span):
+            return match[0] < span[1] and span[0] < match[1]
+
+        # A size only counts if the product offers it. Short sizes like "M" or "L"
+        # must follow a "size" keyword or end the message (a trailing quantity
+        # aside) to avoid false hits.
+        keyword_ends = [m[1] for m in matches if m[2] == KIND_KEYWORD]
+        numbers = [m for m in matches if m[2] == KIND_NUMBER]
+        available = {size.lower(): size for size in products.get(product_id, [])}
+        size_span = None
+        size = None
+        for match in matches:
+            if match[2] != KIND_SIZE or overlaps(match, product_span):
+                continue
+            value = available.get(str(match[3]).lower())
+            if value is None:
+                continue
+            after_keyword = any(text[end:match[0]].strip() == '' for end in keyword_ends if end <= match[0])
+            rest = text[match[1]:].strip()
+            ends_message = not rest or any(
+                text[match[1]:number[0]].strip() == '' and not text[number[1]:].strip() for number in numbers
+            )
+            if len(value) <= 2 and not after_keyword and not ends_message:
+                continue
+            if size is None or after_keyword:
+                size_span, size = match, value
+
+        quantity = None
+        for match in matches:
+            if match[2] != KIND_NUMBER or overlaps(match, product_span):
+                continue
+            if size_span and overlaps(match, size_span):
+                continue
+            quantity = match[3]
+            break
+
+        return ParsedOrder(product_id=product_id, quantity=quantity, size=size)
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_catalog_matcher(seller):
+    """Returns the up-to-date matcher for a seller, compiling it on first use."""
+    matcher = _matchers.get(seller.pk)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.setdefault(seller.pk, CatalogMatcher(seller.pk))
+    matcher.refresh()
+    return matcher
+
+
+def parse_order_text(seller, text):
+    """Parses free text like "2 black hoodies size L" against the seller's catalog."""
+    if not text or not text.strip():
+        return None
+    return get_catalog_matcher(seller).parse(text)
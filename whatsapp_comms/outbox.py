@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .inbox_stream import publish_inbox_event
+from .models import Conversation, OutboxEvent
+from .serializers import ConversationSerializer, MessageSerializer
+
+
+def whatsapp_message_event(recipient_phone, message_payload):
+    """An unsaved outbox event for a WhatsApp message, for enqueue_events()."""
+    return OutboxEvent(
+        kind=OutboxEvent.Kind.WHATSAPP_MESSAGE,
+        recipient=recipient_phone,
+        payload={'message': message_payload},
+    )
+
+
+def inbox_event(seller_pk, event):
+    """An unsaved outbox event for the seller's inbox group, for enqueue_events()."""
+    return OutboxEvent(
+        kind=OutboxEvent.Kind.INBOX_EVENT,
+        recipient=f'seller_inbox_{seller_pk}',
+        payload=event,
+    )
+
+
+def enqueue_events(events):
+    """Records many outbox events with one INSERT."""
+    return OutboxEvent.objects.bulk_create(events)
+
+
+def enqueue_whatsapp_message(recipient_phone, message_payload):
+    """Records a WhatsApp message to be sent by the relay once the current transaction commits."""
+    event = whatsapp_message_event(recipient_phone, message_payload)
+    event.save()
+    return event
+
+
+def enqueue_inbox_event(seller_pk, event):
+    """Records a channel-layer event for the seller's inbox group."""
+    event = inbox_event(seller_pk, event)
+    event.save()
+    return event
+
+
+def message_inbox_events(message):
+    """
+    The inbox events for a newly stored message: the message itself, for an
+    open chat, and its conversation's updated list row, so the dashboard can
+    move that row to the top without reloading the list.
+    """
+    conversation = Conversation.objects.select_related('customer').get(pk=message.conversation_id)
+    return [
+        {
+            'type': 'custom_message',
+            'message_type': 'message',
+            'message': MessageSerializer(message).data,
+        },
+        {
+            'type': 'conversation_updated',
+            'conversation': ConversationSerializer(conversation).data,
+        },
+    ]
+
+
+def enqueue_message_events(message):
+    """Records the inbox events for a new message; call inside the transaction that stored it."""
+    seller_pk = message.conversation.seller_id
+    return enqueue_events([inbox_event(seller_pk, event) for event in message_inbox_events(message)])
+
+
+def _publish(event):
+    """Delivers one event. Raises if the delivery did not go through."""
+    if event.kind == OutboxEvent.Kind.WHATSAPP_MESSAGE:
+        # Imported here to avoid loading the webhook views when only enqueuing
+        from .views import send_whatsapp_message
+        if not send_whatsapp_message(event.recipient, event.payload['message']):
+            raise RuntimeError("Meta Cloud API did not accept the message.")
+    elif event.kind == OutboxEvent.Kind.INBOX_EVENT:
+        publish_inbox_event(event.recipient, event.payload)
+    else:
+        raise ValueError(f"Unknown outbox event kind: {event.kind}")
+
+
+def _retry_delay(attempts):
+    """Seconds to wait before the next try of an event that has failed `attempts` times."""
+    return min(settings.OUTBOX_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_DELAY)
+
+
+def _claim_pending_events(batch_size):
+    """
+    Claims the oldest events that are due, in a short transaction, by moving
+    their next_attempt_at past OUTBOX_CLAIM_TIMEOUT_SECONDS. Other relays
+    skip them until then; if this relay dies, they become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS, next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                next_attempt_at=now + timedelta(seconds=settings.OUTBOX_CLAIM_TIMEOUT_SECONDS)
+            )
+    return events
+
+
+def publish_pending_events(batch_size=100):
+    """
+    Publishes the oldest unpublished events. Returns how many were attempted.
+
+    Events are claimed and committed first, then published with no
+    transaction or row locks held, so a slow Graph API call only delays its
+    own batch. They are marked published only after delivery succeeds, so a
+    crash can re-send an event but never lose one. A failed event is retried
+    with exponential backoff until OUTBOX_MAX_ATTEMPTS. SKIP LOCKED lets
+    several relays share the work.
+    """
+    events = _claim_pending_events(batch_size)
+    for event in events:
+        try:
+            _publish(event)
+            event.published_at = timezone.now()
+        except Exception as e:
+            event.attempts += 1
+            event.last_error = str(e)
+            event.next_attempt_at = timezone.now() + timedelta(seconds=_retry_delay(event.attempts))
+            print(f"Failed to publish outbox event #{event.id} (attempt {event.attempts}): {e}")
+
+    OutboxEvent.objects.bulk_update(events, ['published_at', 'attempts', 'last_error', 'next_attempt_at'])
+    return len(events)
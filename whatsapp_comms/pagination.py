@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ConversationCursorPagination(CursorPagination):
+    """Most recently active conversations first; the cursor follows (updated_at, id)."""
+    ordering = ('-updated_at', '-id')
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MessageCursorPagination(CursorPagination):
+    """
+    Newest messages first, so opening a chat returns the latest page straight
+    off the (conversation, timestamp, id) index; `next` loads older messages.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -14,17 +14,24 @@ class ConversationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Conversation
-        fields = ["id", "customer", "state", "updated_at", "last_message"]
+        fields = ["id", "customer", "state", "updated_at", "last_message", "unread_count"]
 
     def get_last_message(self, obj):
-        message = obj.messages.last()
-        if message:
-            return MessageSerializer(message).data
-        return None
+        # Built from the denormalized columns, so listing needs no per-row queries
+        if obj.last_message_id is None:
+            return None
+        return {
+            "id": obj.last_message_id,
+            "conversation": obj.id,
+            "sender": obj.last_message_sender,
+            "content": obj.last_message_preview,
+            # Formatted like MessageSerializer so the row can also be sent as a JSON inbox event
+            "timestamp": serializers.DateTimeField().to_representation(obj.last_message_at),
+        }
 
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = ["id", "conversation", "sender", "content", "timestamp"]
-        read_only_fields = ["id", "timestamp"]
+        read_only_fields = ["id", "conversation", "sender", "timestamp"]
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import whatsapp_webhook
-from .views_inbox import ConversationViewSet, MessageViewSet
+from .views_inbox import ConversationViewSet, MessageViewSet, export_messages, inbox_metrics
 
 router = DefaultRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
@@ -13,6 +13,8 @@ message_list = MessageViewSet.as_view({
 
 urlpatterns = [
     path('webhook/', whatsapp_webhook, name='whatsapp_webhook'),
+    path('inbox/metrics/', inbox_metrics, name='inbox-metrics'),
+    path('messages/export/', export_messages, name='message-export'),
     path('', include(router.urls)),
     path('conversations/<int:conversation_pk>/messages/', message_list, name='message-list'),
 ]
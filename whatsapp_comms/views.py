@@ -1,6 +1,7 @@
 # retail_saas/whatsapp_comms/views.py
 
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
@@ -9,7 +10,8 @@ import requests
 import json
 
 # Import the models 
-from .models import Customer, Conversation
+from .models import Customer, Conversation, Message
+from .outbox import enqueue_message_events
 from sellers.models import SellerProfile
 from products.models import Product # Import the Product model
 from .handlers import ( 
@@ -26,6 +28,10 @@ from .handlers import (
 )
 
 
+# (connect, read) timeouts for Meta Cloud API calls, so a hung request can't stall the outbox relay
+WHATSAPP_HTTP_TIMEOUT = (3.05, 10)
+
+
 # The mapping of a state to its handler function
 STATE_HANDLERS = {
     Conversation.ConversationState.STARTED: handle_state_started,
@@ -77,10 +83,14 @@ def whatsapp_webhook(request):
                         print(f"Identified Seller: {seller_profile.user.username}")
                         print(f"Current conversation state: {conversation.state}")
 
+                        # Store the customer's message and push it to the seller's inbox
+                        record_message(conversation, 'customer', inbound_message_text(message_details))
+
                         # Pass the full message_details dictionary to the processor
                         response_payload = process_message(conversation, message_details)
 
                         if response_payload:
+                            record_message(conversation, 'bot', reply_preview_text(response_payload))
                             send_whatsapp_message(customer.phone_number, response_payload)
 
                     except SellerProfile.DoesNotExist:
@@ -102,6 +112,34 @@ def whatsapp_webhook(request):
 
         return JsonResponse({"status": "ok"}, status=200)
 
+def inbound_message_text(message_details):
+    """The text to store for a customer message: the typed body or the tapped option's title."""
+    if message_details.get('type') == 'text':
+        return message_details.get('text', {}).get('body', '')
+    interactive_data = message_details.get('interactive', {})
+    reply = interactive_data.get(interactive_data.get('type'), {})
+    return reply.get('title') or f"[{message_details.get('type')}]"
+
+
+def reply_preview_text(message_payload):
+    """The text to store for a bot reply: the message body of a text or interactive payload."""
+    if isinstance(message_payload, str):
+        return message_payload
+    if message_payload.get('type') == 'interactive':
+        return message_payload.get('interactive', {}).get('body', {}).get('text', '[interactive]')
+    return message_payload.get('text', {}).get('body', f"[{message_payload.get('type')}]")
+
+
+def record_message(conversation, sender, content):
+    """
+    Stores a message and, in the same transaction, queues its inbox events
+    (the message and the conversation's new list row) for the outbox relay.
+    """
+    with transaction.atomic():
+        message = Message.objects.create_in_conversation(conversation, sender, content)
+        enqueue_message_events(message)
+    return message
+
 def process_message(conversation, message_details):
     """
     Main router. Decides which handler to call based on global commands,
@@ -138,7 +176,8 @@ def process_message(conversation, message_details):
         response_payload = "Sorry, I've gotten a bit confused. Let's start over by typing 'menu'."
         conversation.state = Conversation.ConversationState.AWAITING_COMMAND
     
-    conversation.save()
+    # Only the bot's own fields; the last-message columns are maintained by UPDATEs
+    conversation.save(update_fields=['state', 'context', 'updated_at'])
     print(f"SAVED conversation. New state is: {conversation.state}")
     
     return response_payload
@@ -148,6 +187,7 @@ def send_whatsapp_message(recipient_phone, message_payload):
     Sends a message using the Meta Cloud API.
     The payload can be a simple text string or a complex dictionary for interactive messages.
     This version automatically adds a helpful footer to interactive messages.
+    Returns True if Meta accepted the message.
     """
     api_url = f"https://graph.facebook.com/v22.0/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
     headers = {
@@ -180,13 +220,15 @@ def send_whatsapp_message(recipient_phone, message_payload):
             }
     else:
         print(f"Error: Invalid message_payload type provided: {type(message_payload)}")
-        return
+        return False
 
     print(f"--- Sending API Request to Meta ---\n{json.dumps(data, indent=2)}\n---------------------------------")
 
     try:
-        response = requests.post(api_url, json=data, headers=headers)
+        response = requests.post(api_url, json=data, headers=headers, timeout=WHATSAPP_HTTP_TIMEOUT)
         response.raise_for_status()
         print(f"Successfully sent message to {recipient_phone}.")
+        return True
     except requests.exceptions.RequestException as e:
-        print(f"Error sending Meta Cloud API message: {e.response.text if e.response else e}")
\ No newline at end of file
+        print(f"Error sending Meta Cloud API message: {e.response.text if e.response else e}")
+        return False
\ No newline at end of file
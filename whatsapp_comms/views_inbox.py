@@ -1,40 +1,94 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import viewsets, permissions
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 
+from core_backend.exports import export_window, iterate, stream_export
+
+from .consumers import inbox_socket_metrics
 from .models import Conversation, Message
+from .outbox import enqueue_message_events
+from .pagination import ConversationCursorPagination, MessageCursorPagination
 from .serializers import ConversationSerializer, MessageSerializer
 
 
 class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ConversationCursorPagination
 
     def get_queryset(self):
-        return Conversation.objects.filter(seller=self.request.user.seller_profile).order_by('-updated_at')
+        return (
+            Conversation.objects.filter(seller_id=self.request.user.pk)
+            .select_related('customer')
+            .order_by('-updated_at', '-id')
+        )
+
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        """Clears the unread counter once the seller has opened the conversation."""
+        updated = self.get_queryset().filter(pk=pk).update(unread_count=0)
+        return Response({'unread_count': 0}, status=200 if updated else 404)
 
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     http_method_names = ['get', 'post', 'head', 'options']
+    pagination_class = MessageCursorPagination
 
     def get_queryset(self):
-        conversation = Conversation.objects.get(pk=self.kwargs['conversation_pk'], seller=self.request.user.seller_profile)
-        return conversation.messages.all()
+        # Ownership is checked in the same query instead of fetching the conversation first
+        return Message.objects.filter(
+            conversation_id=self.kwargs['conversation_pk'],
+            conversation__seller_id=self.request.user.pk,
+        )
 
     def perform_create(self, serializer):
         conversation = Conversation.objects.get(pk=self.kwargs['conversation_pk'], seller=self.request.user.seller_profile)
-        message = serializer.save(conversation=conversation, sender='seller')
-
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'seller_inbox_{conversation.seller.pk}',
-            {
-                'type': 'custom_message',
-                'message_type': 'message',
-                'message': MessageSerializer(message).data,
-            }
+        # Queued for the outbox relay in the same transaction, like customer messages
+        with transaction.atomic():
+            message = Message.objects.create_in_conversation(
+                conversation, 'seller', serializer.validated_data['content']
+            )
+            enqueue_message_events(message)
+        serializer.instance = message
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def inbox_metrics(request):
+    """Send-queue depth, lag and frame counters for the inbox sockets served by this process."""
+    return Response(inbox_socket_metrics())
+
+
+MESSAGE_EXPORT_COLUMNS = ['message_id', 'conversation_id', 'customer_phone', 'sender', 'content', 'timestamp']
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_messages(request):
+    """
+    Streams the seller's chat history as CSV or NDJSON (`?output=`), oldest
+    first, optionally for one `?conversation=` and only after `?since=`.
+    """
+    output, since, watermark = export_window(request)
+    messages = Message.objects.filter(conversation__seller_id=request.user.pk, timestamp__lt=watermark)
+    if since is not None:
+        messages = messages.filter(timestamp__gte=since)
+    if request.query_params.get('conversation'):
+        try:
+            messages = messages.filter(conversation_id=int(request.query_params['conversation']))
+        except ValueError:
+            raise ValidationError({'conversation': "Expected a conversation id."})
+
+    rows = iterate(
+        messages.order_by('timestamp', 'id').values(
+            'conversation_id', 'sender', 'content', 'timestamp',
+            message_id=F('id'),
+            customer_phone=F('conversation__customer_id'),
         )
+    )
+    return stream_export(request, rows, MESSAGE_EXPORT_COLUMNS, output, 'messages', watermark)